@@ -0,0 +1,59 @@
+import logging
+import time
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumBuffer:
+    """Coalesces the messages of a Telegram album (shared grouped_id) into one batch.
+
+    Telegram delivers each album item as a separate NewMessage. Items are
+    held until no new item of the group has arrived for `window` seconds,
+    then handed to `flush` together, ordered by message ID, along with the
+    time.time() at which the first item arrived.
+    """
+
+    def __init__(self, flush, window=0.5):
+        self._flush = flush
+        self.window = window
+        self._groups = {}
+
+    def add(self, message):
+        """Buffer an album item, (re)starting the group's coalescing window"""
+        group = self._groups.get(message.grouped_id)
+        if group is None:
+            group = self._groups[message.grouped_id] = {
+                'messages': [], 'deadline': 0, 'task': None, 'received_at': time.time()
+            }
+            group['task'] = asyncio.get_running_loop().create_task(self._wait_and_flush(message.grouped_id))
+        group['messages'].append(message)
+        group['deadline'] = time.monotonic() + self.window
+
+    async def _wait_and_flush(self, grouped_id):
+        group = self._groups[grouped_id]
+        while True:
+            delay = group['deadline'] - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self._flush_group(grouped_id)
+
+    async def _flush_group(self, grouped_id):
+        group = self._groups.pop(grouped_id, None)
+        if not group:
+            return
+        messages = sorted(group['messages'], key=lambda m: m.id)
+        try:
+            await self._flush(messages, group['received_at'])
+        except Exception as e:
+            logger.error(f"❌ Album {grouped_id} forward error: {str(e)}")
+
+    def __len__(self):
+        return len(self._groups)
+
+    async def close(self):
+        """Flush every pending album immediately"""
+        for grouped_id, group in list(self._groups.items()):
+            group['task'].cancel()
+            await self._flush_group(grouped_id)
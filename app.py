@@ -3,20 +3,31 @@ import logging
 import threading
 import time
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify, flash
+from flask import Flask, Response, render_template, request, session, redirect, url_for, jsonify, flash
 from telethon import TelegramClient, events
 from telethon.errors import SessionPasswordNeededError, PhoneNumberInvalidError
 from telethon.sessions import StringSession
 import asyncio
+import concurrent.futures
+import zlib
 from functools import wraps
 import psycopg2
 from psycopg2.extras import DictCursor
 from psycopg2 import pool
-from contextlib import contextmanager
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
 from werkzeug.security import generate_password_hash, check_password_hash
 from forms import LoginForm, RegisterForm
 from flask_wtf.csrf import CSRFProtect
 from urllib.parse import urlparse, parse_qs
+from notifications import ChangeListener, notify_change
+import channel_catalog
+import migrate
+import queries
+import backfill
+import metrics
+from overview import OverviewCache, fetch_overview
+import main
 
 # Set up logging
 logging.basicConfig(
@@ -35,9 +46,12 @@ app.config.update(
     SESSION_PERMANENT=True,
     WTF_CSRF_TIME_LIMIT=None,  # No time limit for CSRF tokens
     WTF_CSRF_SSL_STRICT=False,  # Don't require HTTPS for CSRF
-    DEBUG=True
+    DEBUG=os.environ.get('FLASK_DEBUG') == '1'
 )
 
+if not os.environ.get('FLASK_SECRET_KEY'):
+    logger.warning("⚠️ FLASK_SECRET_KEY is not set; sessions will not be shared between server workers")
+
 # Initialize CSRF protection
 csrf = CSRFProtect(app)
 csrf.init_app(app)
@@ -86,98 +100,210 @@ def get_db():
         if conn:
             db_pool.putconn(conn)
 
+class ClientPoolFull(Exception):
+    """Raised when every pooled Telegram client is busy and the pool is at its cap"""
+
+
 class TelegramManager:
-    def __init__(self, api_id, api_hash):
+    """Runs Telegram client work for web requests on a fixed set of event loops.
+
+    Each loop lives in its own thread and keeps a pool of connected clients,
+    one per Telegram account (or per pending login), so requests reuse a
+    connection instead of connecting on every page. Pools are bounded by
+    `max_clients` and clients idle for `idle_timeout` seconds are closed,
+    least recently used first.
+    """
+
+    def __init__(self, api_id, api_hash, loops=1, max_clients=50, idle_timeout=300):
         self.api_id = api_id
         self.api_hash = api_hash
-        self._lock = threading.Lock()
-        self._client = None
-        self._loop = asyncio.new_event_loop()
-        threading.Thread(target=self._run_loop, daemon=True).start()
-        self._current_phone = None
-        self._current_hash = None
-
-    def _run_loop(self):
+        self.idle_timeout = idle_timeout
+        self._loops = []
+        self._pools = {}
+        self._locks = {}
+        loops = max(1, loops)
+        self._max_per_loop = max(1, -(-max_clients // loops))
+        for i in range(loops):
+            loop = asyncio.new_event_loop()
+            self._pools[loop] = OrderedDict()
+            self._locks[loop] = {}
+            threading.Thread(target=self._run_loop, args=(loop,), name=f"telegram-loop-{i}", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._evict_idle_forever(), loop)
+            self._loops.append(loop)
+
+    def _run_loop(self, loop):
         """Run event loop in background thread"""
-        asyncio.set_event_loop(self._loop)
-        self._loop.run_forever()
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def loop_for(self, key):
+        """Pick the event loop serving a given user, so their clients are reused"""
+        if key is None:
+            return self._loops[0]
+        return self._loops[zlib.crc32(str(key).encode()) % len(self._loops)]
+
+    def run(self, coro, key=None, timeout=30):
+        """Run a coroutine on the loop for `key` and wait for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop_for(key))
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
 
     async def _initialize_client(self, session_string=None):
-        """Initialize the Telegram client"""
+        """Connect a new Telegram client on the current loop"""
+        # Always use in-memory session
+        session = StringSession(session_string) if session_string else StringSession()
+        client = TelegramClient(
+            session,
+            self.api_id,
+            self.api_hash,
+            device_model="Replit Web",
+            system_version="Linux",
+            app_version="1.0",
+            loop=asyncio.get_running_loop()
+        )
         try:
-            if not self._client:
-                # Always use in-memory session
-                session = StringSession(session_string) if session_string else StringSession()
-                self._client = TelegramClient(
-                    session,
-                    self.api_id,
-                    self.api_hash,
-                    device_model="Replit Web",
-                    system_version="Linux",
-                    app_version="1.0",
-                    loop=self._loop
-                )
-                await self._client.connect()
-                logger.info("✅ Telegram client initialized")
-        except Exception as e:
-            logger.error(f"❌ Client initialization error: {str(e)}")
-            self._client = None
+            await client.connect()
+        except Exception:
+            await self._disconnect(client)
             raise
+        logger.info("✅ Telegram client initialized")
+        return client
 
-    def save_verification_data(self, phone, hash_value):
-        """Save phone and hash for verification"""
-        self._current_phone = phone
-        self._current_hash = hash_value
-        logger.info("✅ Saved verification data")
+    @asynccontextmanager
+    async def client(self, key, session_string=None):
+        """Borrow the pooled client for `key`, connecting it if needed.
 
-    def get_verification_data(self):
-        """Get saved verification data"""
-        return self._current_phone, self._current_hash
-
-    async def get_client(self, session_string=None):
-        """Get the Telegram client instance"""
-        with self._lock:
+        `key` identifies the account (its telegram_id) or a pending login
+        ('login:<user_id>'). A client is never evicted while borrowed.
+        """
+        entry = await self._acquire(key, session_string)
+        try:
+            yield entry['client']
+        finally:
+            entry['users'] -= 1
+            entry['last_used'] = time.monotonic()
+
+    async def _acquire(self, key, session_string):
+        loop = asyncio.get_running_loop()
+        pool = self._pools[loop]
+        lock = self._locks[loop].setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = pool.get(key)
+            # Compared with the session the client has now: a login client connected
+            # without one has since saved exactly the session verify-otp asks for
+            if entry and entry['client'].is_connected() and \
+                    (session_string is None or entry['client'].session.save() == session_string):
+                pool.move_to_end(key)
+                entry['users'] += 1
+                entry['last_used'] = time.monotonic()
+                return entry
+
+            if entry:
+                await self._close(key)
+            await self._make_room(pool)
             try:
-                if self._client and self._client.is_connected():
-                    return self._client
-
-                await self._cleanup_client()
-                await self._initialize_client(session_string)
-                return self._client
-
+                client = await self._initialize_client(session_string)
             except Exception as e:
                 logger.error(f"❌ Client connection error: {str(e)}")
-                await self._cleanup_client()
                 raise
-
-    async def _cleanup_client(self):
-        """Cleanup the client connection"""
-        if self._client:
-            try:
-                if self._client.is_connected():
-                    await self._client.disconnect()
-            except:
-                pass
-            finally:
-                self._client = None
+            entry = pool[key] = {
+                'client': client,
+                'users': 1,
+                'last_used': time.monotonic()
+            }
+            return entry
+
+    async def _make_room(self, pool):
+        """Close least recently used idle clients until a new one fits under the cap"""
+        while len(pool) >= self._max_per_loop:
+            idle = next((key for key, entry in pool.items() if entry['users'] == 0), None)
+            if idle is None:
+                raise ClientPoolFull("All Telegram connections are busy, please try again shortly")
+            await self._close(idle)
+
+    async def release(self, key):
+        """Disconnect and forget the client for `key` (e.g. after logout or a finished login)"""
+        await self._close(key)
+
+    async def _close(self, key):
+        loop = asyncio.get_running_loop()
+        entry = self._pools[loop].pop(key, None)
+        lock = self._locks[loop].get(key)
+        if lock and not lock.locked():
+            self._locks[loop].pop(key, None)
+        if entry:
+            await self._disconnect(entry['client'])
+
+    async def _disconnect(self, client):
+        try:
+            if client.is_connected():
+                await client.disconnect()
+        except Exception as e:
+            logger.error(f"❌ Client cleanup error: {str(e)}")
+
+    async def _evict_idle_forever(self):
+        """Close clients nobody has used for idle_timeout seconds"""
+        pool = self._pools[asyncio.get_running_loop()]
+        while True:
+            await asyncio.sleep(min(60, self.idle_timeout))
+            cutoff = time.monotonic() - self.idle_timeout
+            for key, entry in list(pool.items()):
+                if entry['users'] == 0 and entry['last_used'] < cutoff:
+                    logger.info(f"Closing idle Telegram client {key}")
+                    await self._close(key)
+
+    def stats(self):
+        """Number of pooled clients per loop"""
+        return [len(self._pools[loop]) for loop in self._loops]
 
 # Initialize the Telegram manager
 telegram_manager = TelegramManager(
     int(os.getenv('API_ID')),
-    os.getenv('API_HASH')
+    os.getenv('API_HASH'),
+    loops=int(os.getenv('TELEGRAM_LOOPS', '4')),
+    max_clients=int(os.getenv('TELEGRAM_MAX_CLIENTS', '50')),
+    idle_timeout=int(os.getenv('TELEGRAM_CLIENT_IDLE_TIMEOUT', '300'))
 )
 
-# Async route decorator that uses the telegram manager's event loop
+ASYNC_ROUTE_TIMEOUT = int(os.getenv('ASYNC_ROUTE_TIMEOUT', '30'))
+
+# Dashboard overview data, cached briefly per user and dropped by the write routes. Every
+# hypercorn worker has its own cache, so each one also drops a user's entry when any
+# worker announces a change on the forwarding_events channel.
+overview_cache = OverviewCache(ttl=float(os.getenv('OVERVIEW_CACHE_TTL', '5')))
+
+def _on_forwarding_event(event):
+    if event.get('user_id') is None:
+        # A reconnect (changes may have been missed) or a worker-wide event
+        overview_cache.clear()
+    else:
+        overview_cache.invalidate(event['user_id'])
+
+asyncio.run_coroutine_threadsafe(
+    ChangeListener(db_url, _on_forwarding_event).run(), telegram_manager.loop_for(None)
+)
+
+# /metrics requires "Authorization: Bearer <token>" and isn't served at all without METRICS_TOKEN:
+# the labels carry every account's telegram_id
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+metrics.gauge('dashboard_telegram_clients', 'Connected Telegram clients pooled by the dashboard', ['loop']).set_function(
+    lambda: {(loop,): clients for loop, clients in enumerate(telegram_manager.stats())}
+)
+
+# Async route decorator that runs the view on the telegram manager loop for this user
 def async_route(f):
     @wraps(f)
     def wrapped(*args, **kwargs):
         try:
-            future = asyncio.run_coroutine_threadsafe(
+            return telegram_manager.run(
                 f(*args, **kwargs),
-                telegram_manager._loop
+                key=session.get('user_id'),
+                timeout=ASYNC_ROUTE_TIMEOUT  # Add timeout to prevent hanging
             )
-            return future.result(timeout=30)  # Add timeout to prevent hanging
-        except asyncio.TimeoutError:
+        except concurrent.futures.TimeoutError:
             logger.error("❌ Async route timeout error")
             return jsonify({'error': 'Request timed out'}), 504
         except Exception as e:
@@ -248,11 +374,7 @@ def login_post():
                         return render_template('auth/login.html', form=form)
 
                     # Get primary Telegram account info
-                    cur.execute("""
-                        SELECT telegram_id, session_string
-                        FROM telegram_accounts
-                        WHERE user_id = %s AND is_primary = true AND is_active = true
-                    """, (user['id'],))
+                    cur.execute(queries.PRIMARY_ACCOUNT_QUERY, (user['id'],))
                     primary_account = cur.fetchone()
 
                     logger.info(f"Login successful for user: {user['id']}")
@@ -320,56 +442,26 @@ def logout():
     session.clear()
     return redirect(url_for('login'))
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics of this process (dashboard and, when embedded, the forwarding worker)"""
+    if not METRICS_TOKEN:
+        return Response('Not Found\n', status=404, mimetype='text/plain')
+    if not metrics.authorized(request.headers.get('Authorization'), METRICS_TOKEN):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
     user_id = session.get('user_id')
-    with get_db() as conn:
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            # Get primary Telegram account
-            cur.execute("""
-                SELECT telegram_id, telegram_username, auth_date, session_string
-                FROM telegram_accounts
-                WHERE user_id = %s AND is_primary = true
-            """, (user_id,))
-            primary_account = cur.fetchone()
-
-            # Get forwarding config
-            cur.execute("""
-                SELECT *
-                FROM forwarding_configs
-                WHERE user_id = %s
-            """, (user_id,))
-            config = cur.fetchone()
 
-            # Get replacement count
-            cur.execute("""
-                SELECT COUNT(*)
-                FROM text_replacements
-                WHERE user_id = %s
-            """, (user_id,))
-            replacements_count = cur.fetchone()[0]
+    def _load():
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                return fetch_overview(cur, user_id)
 
-            # Get recent forwarding logs
-            cur.execute("""
-                SELECT source_message_id, dest_message_id, 
-                       message_text, received_at, forwarded_at
-                FROM forwarding_logs
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-                LIMIT 5
-            """, (user_id,))
-            forwarding_logs = cur.fetchall()
-
-    return render_template('dashboard/overview.html',
-                       telegram_authorized=bool(primary_account),
-                       telegram_username=primary_account['telegram_username'] if primary_account else None,
-                       telegram_auth_date=primary_account['auth_date'] if primary_account else None,
-                       source_channel=config['source_channel'] if config else None,
-                       dest_channel=config['destination_channel'] if config else None,
-                       is_active=config['is_active'] if config else False,
-                       replacements_count=replacements_count,
-                       forwarding_logs=forwarding_logs)
+    return render_template('dashboard/overview.html', **overview_cache.get(user_id, _load))
 
 @app.route('/authorization')
 @login_required
@@ -410,6 +502,94 @@ def replacements():
     return render_template('dashboard/replacements.html',
                          replacements=replacements)
 
+CHANNEL_CATALOG_TTL = int(os.getenv('CHANNEL_CATALOG_TTL', '3600'))
+
+# Accounts whose channel catalogue is currently being refreshed in the background
+_channel_refreshes = set()
+
+def load_channel_catalog(telegram_id):
+    """Read an account's cached channel list"""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            return channel_catalog.load_channels(cur, telegram_id)
+
+def store_channel_catalog(telegram_id, channels):
+    """Replace an account's cached channel list with a fresh listing"""
+    with get_db() as conn:
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cur:
+                channel_catalog.replace_channels(cur, telegram_id, channels)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = True
+
+async def refresh_channel_catalog(telegram_id, session_string):
+    """Walk the account's dialogs once and store the result in the catalogue"""
+    async with telegram_manager.client(telegram_id, session_string) as client:
+        channels = await channel_catalog.fetch_channels(client)
+    await asyncio.to_thread(store_channel_catalog, telegram_id, channels)
+    logger.info(f"✅ Refreshed {len(channels)} channels for account {telegram_id}")
+    return channels
+
+def schedule_channel_refresh(telegram_id, session_string):
+    """Refresh the catalogue in the background unless a refresh is already running"""
+    if telegram_id in _channel_refreshes:
+        return
+    _channel_refreshes.add(telegram_id)
+
+    async def _refresh():
+        try:
+            await refresh_channel_catalog(telegram_id, session_string)
+        except Exception as e:
+            logger.error(f"❌ Background channel refresh error for {telegram_id}: {str(e)}")
+        finally:
+            _channel_refreshes.discard(telegram_id)
+
+    asyncio.get_running_loop().create_task(_refresh())
+
+def load_forwarding_setup(user_id):
+    """Read everything the forwarding page shows from the database; None without a primary account"""
+    with get_db() as conn:
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            # Get primary telegram account
+            cur.execute(queries.PRIMARY_ACCOUNT_QUERY, (user_id,))
+            primary_account = cur.fetchone()
+
+            if not primary_account:
+                return None
+
+            # Get forwarding config without using COALESCE for bigint columns
+            cur.execute(queries.FORWARDING_CONFIG_QUERY, (user_id,))
+            config = cur.fetchone()
+
+            if not config:
+                logger.info(f"No forwarding config found for user {user_id}")
+                config = {
+                    'source_channel': None,
+                    'destination_channel': None,
+                    'is_active': False
+                }
+
+            # Get active replacements
+            cur.execute(queries.ACTIVE_REPLACEMENTS_QUERY, (user_id,))
+            replacements = {row['original_text']: row['replacement_text'] 
+                          for row in cur.fetchall()}
+
+            # Get additional routes
+            cur.execute(queries.USER_ROUTES_QUERY, (user_id,))
+            routes = [{'id': row['id'],
+                       'source': str(row['source_channel']),
+                       'destination': str(row['destination_channel'])}
+                      for row in cur.fetchall()]
+
+            backfill_jobs = [backfill_job_json(job) for job in backfill.list_jobs(cur, user_id)]
+
+    return primary_account, config, replacements, routes, backfill_jobs
+
 @app.route('/forwarding')
 @login_required
 @async_route
@@ -419,80 +599,28 @@ async def forwarding():
         user_id = session.get('user_id')
         logger.info(f"Loading forwarding page for user {user_id}")
 
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=DictCursor) as cur:
-                # Get primary telegram account
-                cur.execute("""
-                    SELECT telegram_id, telegram_username, auth_date, session_string
-                    FROM telegram_accounts
-                    WHERE user_id = %s AND is_primary = true AND is_active = true
-                """, (user_id,))
-                primary_account = cur.fetchone()
-
-                if not primary_account:
-                    logger.warning(f"No primary Telegram account found for user {user_id}")
-                    return render_template('dashboard/forwarding.html',
-                                      telegram_authorized=False)
-
-                # Get forwarding config without using COALESCE for bigint columns
-                cur.execute("""
-                    SELECT source_channel, destination_channel, is_active
-                    FROM forwarding_configs
-                    WHERE user_id = %s
-                """, (user_id,))
-                config = cur.fetchone()
-
-                if not config:
-                    logger.info(f"No forwarding config found for user {user_id}")
-                    config = {
-                        'source_channel': None,
-                        'destination_channel': None,
-                        'is_active': False
-                    }
-
-                # Get active replacements
-                cur.execute("""
-                    SELECT original_text, replacement_text
-                    FROM text_replacements
-                    WHERE user_id = %s AND is_active = true
-                """, (user_id,))
-                replacements = {row['original_text']: row['replacement_text'] 
-                              for row in cur.fetchall()}
-
-        # Get channel list from Telegram
-        channels = []
-        client = None
-        try:
-            client = await telegram_manager.get_client(primary_account['session_string'])
-            logger.info("✅ Got Telegram client")
-
-            # Get all dialogs (channels)
-            async for dialog in client.iter_dialogs():
-                if dialog.is_channel:
-                    channel_id = str(dialog.id)
-                    if not channel_id.startswith('-100'):
-                        channel_id = f'-100{channel_id.lstrip("-")}'
-
-                    channels.append({
-                        'id': channel_id,
-                        'name': dialog.name
-                    })
-                    logger.info(f"Found channel: {dialog.name} ({channel_id})")
-
-            logger.info(f"✅ Found {len(channels)} channels")
-
-        except Exception as e:
-            logger.error(f"❌ Channel list error: {str(e)}")
+        # Database reads run off the Telegram loop so they don't stall other users' requests
+        setup = await asyncio.to_thread(load_forwarding_setup, user_id)
+        if not setup:
+            logger.warning(f"No primary Telegram account found for user {user_id}")
             return render_template('dashboard/forwarding.html',
-                              telegram_authorized=True,
-                              error="Failed to fetch channels. Please try logging out and authorizing your Telegram account again.")
-        finally:
-            if client:
-                try:
-                    await client.disconnect()
-                    logger.info("✅ Telegram client disconnected")
-                except Exception as e:
-                    logger.error(f"❌ Client cleanup error: {str(e)}")
+                              telegram_authorized=False)
+        primary_account, config, replacements, routes, backfill_jobs = setup
+
+        # Serve the channel list from the catalogue, refreshing it from Telegram only when needed
+        telegram_id = primary_account['telegram_id']
+        channels, refreshed_at = await asyncio.to_thread(load_channel_catalog, telegram_id)
+        if not channels and refreshed_at is None:
+            try:
+                channels = await refresh_channel_catalog(telegram_id, primary_account['session_string'])
+                refreshed_at = datetime.now()
+            except Exception as e:
+                logger.error(f"❌ Channel list error: {str(e)}")
+                return render_template('dashboard/forwarding.html',
+                                  telegram_authorized=True,
+                                  error="Failed to fetch channels. Please try logging out and authorizing your Telegram account again.")
+        elif request.args.get('refresh') or channel_catalog.is_stale(refreshed_at, CHANNEL_CATALOG_TTL):
+            schedule_channel_refresh(telegram_id, primary_account['session_string'])
 
         # Format None values to empty strings for template
         source_channel = str(config['source_channel']) if config['source_channel'] else ''
@@ -506,7 +634,12 @@ async def forwarding():
                           source_channel=source_channel,
                           dest_channel=dest_channel,
                           bot_status=config['is_active'],
-                          replacements=replacements)
+                          replacements=replacements,
+                          routes=routes,
+                          backfill_jobs=backfill_jobs,
+                          channel_names={channel['id']: channel['name'] for channel in channels},
+                          channels_refreshed_at=refreshed_at,
+                          channels_refreshing=telegram_id in _channel_refreshes)
 
     except Exception as e:
         logger.error(f"❌ Forwarding page error: {str(e)}")
@@ -514,6 +647,100 @@ async def forwarding():
                           telegram_authorized=False,
                           error="An error occurred loading the forwarding page. Please try again.")
 
+# How long a code sent by send-otp can still be verified
+PENDING_LOGIN_TTL = '15 minutes'
+
+def save_pending_login(user_id, phone, phone_code_hash, session_string):
+    """Remember a login waiting for its code, replacing any earlier one of the user"""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                DELETE FROM pending_logins
+                WHERE created_at < CURRENT_TIMESTAMP - INTERVAL '{PENDING_LOGIN_TTL}'
+            """)
+            cur.execute("""
+                INSERT INTO pending_logins (user_id, phone, phone_code_hash, session_string)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE
+                SET phone = EXCLUDED.phone, phone_code_hash = EXCLUDED.phone_code_hash,
+                    session_string = EXCLUDED.session_string, created_at = CURRENT_TIMESTAMP
+            """, (user_id, phone, phone_code_hash, session_string))
+
+def load_pending_login(user_id):
+    """The user's login waiting for its code, if it hasn't expired"""
+    with get_db() as conn:
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            cur.execute(f"""
+                SELECT phone, phone_code_hash, session_string
+                FROM pending_logins
+                WHERE user_id = %s AND created_at >= CURRENT_TIMESTAMP - INTERVAL '{PENDING_LOGIN_TTL}'
+            """, (user_id,))
+            return cur.fetchone()
+
+def delete_pending_login(user_id):
+    """Forget a finished login; its session is now the account's own"""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM pending_logins WHERE user_id = %s", (user_id,))
+
+def save_telegram_account(user_id, me, session_string):
+    """Store a freshly authorized Telegram account; returns the response body and status"""
+    with get_db() as conn:
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            # Check if this Telegram account is already connected to the same user
+            cur.execute("""
+                SELECT user_id, is_active 
+                FROM telegram_accounts 
+                WHERE telegram_id = %s
+            """, (me.id,))
+            existing = cur.fetchone()
+
+            if existing:
+                if existing['user_id'] == user_id:
+                    if existing['is_active']:
+                        logger.info(f"❌ Account {me.id} already connected to user {user_id}")
+                        return {'error': 'This Telegram account is already connected to your account'}, 400
+                    else:
+                        # If account exists but is inactive, reactivate it
+                        cur.execute("""
+                            UPDATE telegram_accounts 
+                            SET session_string = %s,
+                                auth_date = CURRENT_TIMESTAMP,
+                                is_active = true
+                            WHERE telegram_id = %s AND user_id = %s
+                            RETURNING id
+                        """, (session_string, me.id, user_id))
+
+                        if cur.fetchone():
+                            notify_change(cur, 'account', user_id)
+                            logger.info(f"✅ Successfully reactivated Telegram account {me.id}")
+                            return {'message': 'Account reactivated successfully'}, 200
+                        else:
+                            return {'error': 'Failed to reactivate account'}, 500
+                else:
+                    # Check if the account is active for another user
+                    if existing['is_active']:
+                        logger.info(f"❌ Account {me.id} connected to different user {existing['user_id']}")
+                        return {'error': 'This Telegram account is connected to another user'}, 400
+
+            # If no active connection exists, create a new one
+            cur.execute("""
+                INSERT INTO telegram_accounts 
+                (user_id, telegram_id, telegram_username, auth_date, session_string, is_primary, is_active)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, 
+                       NOT EXISTS(SELECT 1 FROM telegram_accounts WHERE user_id = %s AND is_active = true),
+                       true)
+                RETURNING id
+            """, (user_id, me.id, me.username, session_string, user_id))
+
+            result = cur.fetchone()
+            if result:
+                notify_change(cur, 'account', user_id)
+                logger.info(f"✅ Successfully added new Telegram account {me.id}")
+                return {'message': 'Authorization successful'}, 200
+            else:
+                return {'error': 'Failed to add account'}, 500
+
 @app.route('/send-otp', methods=['POST'])
 @async_route
 async def send_otp():
@@ -532,39 +759,39 @@ async def send_otp():
             phone = '+' + phone
 
         try:
-            # Initialize client
-            client = await telegram_manager.get_client()
-            if not client:
-                raise Exception("Failed to initialize Telegram client")
-            logger.info("✅ Got Telegram client")
-
-            # Send code request
-            try:
-                sent = await client.send_code_request(phone)
-                logger.info(f"✅ Successfully sent OTP to {phone}")
-
-                # Save verification data
-                telegram_manager.save_verification_data(phone, sent.phone_code_hash)
+            # A fresh connection: its auth key is what the code will be valid for
+            await telegram_manager.release(f"login:{important_data['user_id']}")
+            async with telegram_manager.client(f"login:{important_data['user_id']}") as client:
+                logger.info("✅ Got Telegram client")
 
-                # Update session
-                session.clear()
-                session.update(important_data)
-                session['user_phone'] = phone
-                session['phone_code_hash'] = sent.phone_code_hash
-                session['otp_sent_at'] = int(time.time())
-                session.permanent = True
-
-                return jsonify({'message': 'OTP sent successfully'})
-
-            except PhoneNumberInvalidError:
-                logger.error(f"❌ Invalid phone number format: {phone}")
-                return jsonify({'error': 'Please enter a valid phone number with country code'}), 400
-            except Exception as e:
-                error_msg = str(e).lower()
-                if "resendcoderequest" in error_msg:
-                    return jsonify({'error': 'Please wait a few minutes before requesting a new OTP'}), 429
-                logger.error(f"❌ Failed to send OTP: {str(e)}")
-                return jsonify({'error': 'Failed to send OTP. Please try again.'}), 500
+                # Send code request
+                try:
+                    sent = await client.send_code_request(phone)
+                    logger.info(f"✅ Successfully sent OTP to {phone}")
+
+                    # The code is bound to this connection's auth key: store both, so any
+                    # dashboard process can rebuild the client for verify-otp
+                    await asyncio.to_thread(save_pending_login, important_data['user_id'], phone,
+                                            sent.phone_code_hash, client.session.save())
+
+                    # Update session
+                    session.clear()
+                    session.update(important_data)
+                    session['user_phone'] = phone
+                    session['otp_sent_at'] = int(time.time())
+                    session.permanent = True
+
+                    return jsonify({'message': 'OTP sent successfully'})
+
+                except PhoneNumberInvalidError:
+                    logger.error(f"❌ Invalid phone number format: {phone}")
+                    return jsonify({'error': 'Please enter a valid phone number with country code'}), 400
+                except Exception as e:
+                    error_msg = str(e).lower()
+                    if "resendcoderequest" in error_msg:
+                        return jsonify({'error': 'Please wait a few minutes before requesting a new OTP'}), 429
+                    logger.error(f"❌ Failed to send OTP: {str(e)}")
+                    return jsonify({'error': 'Failed to send OTP. Please try again.'}), 500
 
         except Exception as e:
             logger.error(f"❌ Critical error: {str(e)}")
@@ -580,98 +807,54 @@ async def verify_otp():
     """Verify OTP and complete Telegram authorization"""
     try:
         # Get verification data
-        stored_phone, stored_hash = telegram_manager.get_verification_data()
-        phone = session.get('user_phone', stored_phone)
-        phone_code_hash = session.get('phone_code_hash', stored_hash)
+        user_id = session.get('user_id')
+        pending = await asyncio.to_thread(load_pending_login, user_id)
         otp = request.form.get('otp')
         password = request.form.get('password')
 
-        if not all([phone, phone_code_hash, otp]):
+        if not pending or not otp:
             logger.error("❌ Missing verification data")
             return jsonify({'error': 'OTP session expired. Please request a new OTP'}), 400
+        phone, phone_code_hash = pending['phone'], pending['phone_code_hash']
 
         try:
-            client = await telegram_manager.get_client()
-            if not client:
-                raise Exception("Failed to initialize Telegram client")
-            logger.info("✅ Got Telegram client for verification")
+            # Rebuilt from the stored session when send-otp ran in another process
+            login_key = f"login:{user_id}"
+            async with telegram_manager.client(login_key, pending['session_string']) as client:
+                logger.info("✅ Got Telegram client for verification")
 
-            try:
-                # First try to sign in with OTP
-                await client.sign_in(phone=phone, code=otp, phone_code_hash=phone_code_hash)
-            except SessionPasswordNeededError:
-                # If 2FA is enabled and password is provided
-                if password:
-                    try:
-                        await client.sign_in(password=password)
-                    except Exception as e:
-                        logger.error(f"❌ 2FA verification failed: {str(e)}")
-                        return jsonify({'error': 'Invalid 2FA password'}), 400
-                else:
-                    logger.info("2FA required")
-                    return jsonify({
-                        'error': 'two_factor_needed',
-                        'message': 'Two-factor authentication required'
-                    })
+                try:
+                    # First try to sign in with OTP
+                    await client.sign_in(phone=phone, code=otp, phone_code_hash=phone_code_hash)
+                except SessionPasswordNeededError:
+                    # If 2FA is enabled and password is provided
+                    if password:
+                        try:
+                            await client.sign_in(password=password)
+                        except Exception as e:
+                            logger.error(f"❌ 2FA verification failed: {str(e)}")
+                            return jsonify({'error': 'Invalid 2FA password'}), 400
+                    else:
+                        logger.info("2FA required")
+                        return jsonify({
+                            'error': 'two_factor_needed',
+                            'message': 'Two-factor authentication required'
+                        })
 
-            # Check if successfully authorized
-            if await client.is_user_authorized():
-                me = await client.get_me()
-                session_string = client.session.save()
+                authorized = await client.is_user_authorized()
+                if authorized:
+                    me = await client.get_me()
+                    session_string = client.session.save()
 
-                with get_db() as conn:
-                    with conn.cursor(cursor_factory=DictCursor) as cur:
-                        # Check if this Telegram account is already connected to the same user
-                        cur.execute("""
-                            SELECT user_id, is_active 
-                            FROM telegram_accounts 
-                            WHERE telegram_id = %s
-                        """, (me.id,))
-                        existing = cur.fetchone()
-
-                        if existing:
-                            if existing['user_id'] == session.get('user_id'):
-                                if existing['is_active']:
-                                    logger.info(f"❌ Account {me.id} already connected to user {session.get('user_id')}")
-                                    return jsonify({'error': 'This Telegram account is already connected to your account'}), 400
-                                else:
-                                    # If account exists but is inactive, reactivate it
-                                    cur.execute("""
-                                        UPDATE telegram_accounts 
-                                        SET session_string = %s,
-                                            auth_date = CURRENT_TIMESTAMP,
-                                            is_active = true
-                                        WHERE telegram_id = %s AND user_id = %s
-                                        RETURNING id
-                                    """, (session_string, me.id, session.get('user_id')))
-
-                                    if cur.fetchone():
-                                        logger.info(f"✅ Successfully reactivated Telegram account {me.id}")
-                                        return jsonify({'message': 'Account reactivated successfully'})
-                                    else:
-                                        return jsonify({'error': 'Failed to reactivate account'}), 500
-                            else:
-                                # Check if the account is active for another user
-                                if existing['is_active']:
-                                    logger.info(f"❌ Account {me.id} connected to different user {existing['user_id']}")
-                                    return jsonify({'error': 'This Telegram account is connected to another user'}), 400
-
-                        # If no active connection exists, create a new one
-                        cur.execute("""
-                            INSERT INTO telegram_accounts 
-                            (user_id, telegram_id, telegram_username, auth_date, session_string, is_primary, is_active)
-                            VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, 
-                                   NOT EXISTS(SELECT 1 FROM telegram_accounts WHERE user_id = %s AND is_active = true),
-                                   true)
-                            RETURNING id
-                        """, (session.get('user_id'), me.id, me.username, session_string, session.get('user_id')))
+            # Check if successfully authorized
+            if authorized:
+                # The login connection is done; the account gets its own pooled client from here on
+                await telegram_manager.release(login_key)
+                await asyncio.to_thread(delete_pending_login, user_id)
 
-                        result = cur.fetchone()
-                        if result:
-                            logger.info(f"✅ Successfully added new Telegram account {me.id}")
-                            return jsonify({'message': 'Authorization successful'})
-                        else:
-                            return jsonify({'error': 'Failed to add account'}), 500
+                body, status = await asyncio.to_thread(save_telegram_account, user_id, me, session_string)
+                overview_cache.invalidate(user_id)
+                return jsonify(body), status
 
             else:
                 logger.error("❌ Authorization failed")
@@ -694,6 +877,32 @@ async def verify_otp():
         logger.error(f"❌ Verification error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def delete_telegram_account(user_id, telegram_id):
+    """Remove one of a user's Telegram accounts; None if it isn't theirs, else whether it was deleted"""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            # Verify ownership
+            cur.execute("""
+                SELECT 1
+                FROM telegram_accounts 
+                WHERE user_id = %s AND telegram_id = %s
+            """, (user_id, telegram_id))
+            if not cur.fetchone():
+                return None
+
+            # Remove account
+            cur.execute("""
+                DELETE FROM telegram_accounts 
+                WHERE user_id = %s AND telegram_id = %s
+                RETURNING id
+            """, (user_id, telegram_id))
+            if not cur.fetchone():
+                return False
+
+            # Let the forwarding workers stop any running session
+            notify_change(cur, 'account', user_id)
+            return True
+
 @app.route('/disconnect/<int:telegram_id>', methods=['POST'])
 @login_required
 @async_route
@@ -702,35 +911,17 @@ async def disconnect_account(telegram_id):
     try:
         user_id = session.get('user_id')
 
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=DictCursor) as cur:
-                # Verify ownership
-                cur.execute("""
-                    SELECT session_string
-                    FROM telegram_accounts 
-                    WHERE user_id = %s AND telegram_id = %s
-                """, (user_id, telegram_id))
-                account = cur.fetchone()
-
-                if not account:
-                    return jsonify({'error': 'Account not found'}), 404
-
-                # Remove account
-                cur.execute("""
-                    DELETE FROM telegram_accounts 
-                    WHERE user_id = %s AND telegram_id = %s
-                    RETURNING id
-                """, (user_id, telegram_id))
+        removed = await asyncio.to_thread(delete_telegram_account, user_id, telegram_id)
+        if removed is None:
+            return jsonify({'error': 'Account not found'}), 404
+        if not removed:
+            return jsonify({'error': 'Failed to disconnect account'}), 500
 
-                if cur.fetchone():
-                    # Clean up any running sessions
-                    import main
-                    main.remove_user_session(telegram_id)
+        overview_cache.invalidate(user_id)
+        await telegram_manager.release(telegram_id)
 
-                    logger.info(f"✅ Successfully disconnected Telegram account {telegram_id}")
-                    return jsonify({'message': 'Successfully disconnected'})
-                else:
-                    return jsonify({'error': 'Failed to disconnect account'}), 500
+        logger.info(f"✅ Successfully disconnected Telegram account {telegram_id}")
+        return jsonify({'message': 'Successfully disconnected'})
 
     except Exception as e:
         logger.error(f"❌ Disconnect error: {str(e)}")
@@ -765,6 +956,8 @@ def make_primary(telegram_id):
                 """, (telegram_id, user_id))
 
                 conn.commit()
+                notify_change(cur, 'account', user_id)
+                overview_cache.invalidate(user_id)
                 logger.info(f"✅ Successfully set Telegram account {telegram_id} as primary")
                 return jsonify({'message': 'Successfully updated primary account'})
 
@@ -818,8 +1011,8 @@ def update_channels():
                     logger.info(f"Saved new config: {new_config}")
 
                     # Stop any running forwarding
-                    import main
-                    main.remove_user_session(session.get('telegram_id'))
+                    notify_change(cur, 'config', user_id)
+                    overview_cache.invalidate(user_id)
 
                     return jsonify({'message': 'Channels updated successfully'})
                 except psycopg2.Error as e:
@@ -831,6 +1024,181 @@ def update_channels():
         logger.error(f"❌ Channel update error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/routes/add', methods=['POST'])
+@login_required
+def add_route():
+    """Forward a source channel to an additional destination"""
+    try:
+        source = request.form.get('source')
+        destination = request.form.get('destination')
+        user_id = session.get('user_id')
+
+        if not all([source, destination, user_id]):
+            return jsonify({'error': 'Missing required data'}), 400
+
+        if source == destination:
+            return jsonify({'error': 'Source and destination channels cannot be the same'}), 400
+
+        # Format channel IDs
+        if not source.startswith('-100'):
+            source = f"-100{source.lstrip('-')}"
+        if not destination.startswith('-100'):
+            destination = f"-100{destination.lstrip('-')}"
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO forwarding_routes (user_id, source_channel, destination_channel)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (user_id, source_channel, destination_channel) DO NOTHING
+                    RETURNING id
+                """, (user_id, source, destination))
+
+                result = cur.fetchone()
+                if not result:
+                    return jsonify({'error': 'This route already exists'}), 400
+
+                # Let the forwarding worker start sending to the new destination
+                notify_change(cur, 'config', user_id)
+                overview_cache.invalidate(user_id)
+
+                logger.info(f"✅ Added route {source} → {destination} for user {user_id}")
+                return jsonify({'message': 'Route added successfully', 'id': result[0]})
+
+    except Exception as e:
+        logger.error(f"❌ Add route error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/routes/<int:route_id>/remove', methods=['POST'])
+@login_required
+def remove_route(route_id):
+    """Stop forwarding along an additional route"""
+    try:
+        user_id = session.get('user_id')
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM forwarding_routes
+                    WHERE id = %s AND user_id = %s
+                    RETURNING id
+                """, (route_id, user_id))
+
+                if not cur.fetchone():
+                    return jsonify({'error': 'Route not found'}), 404
+
+                notify_change(cur, 'config', user_id)
+                overview_cache.invalidate(user_id)
+
+                logger.info(f"✅ Removed route {route_id} for user {user_id}")
+                return jsonify({'message': 'Route removed successfully'})
+
+    except Exception as e:
+        logger.error(f"❌ Remove route error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Upper bound on the number of posts one backfill job may copy
+BACKFILL_MAX_MESSAGES = int(os.getenv('BACKFILL_MAX_MESSAGES', '100000'))
+
+def backfill_job_json(job):
+    """Fields of a backfill job shown on the forwarding page"""
+    return {
+        'id': job['id'],
+        'source': str(job['source_channel']),
+        'destination': str(job['destination_channel']),
+        'status': job['status'],
+        'messages_copied': job['messages_copied'],
+        'message_limit': job['message_limit'],
+        'error': job['last_error']
+    }
+
+@app.route('/backfill/start', methods=['POST'])
+@login_required
+def start_backfill():
+    """Copy the newest posts of a source channel into a destination in the background"""
+    try:
+        source = request.form.get('source')
+        destination = request.form.get('destination')
+        user_id = session.get('user_id')
+
+        if not all([source, destination, user_id]):
+            return jsonify({'error': 'Missing required data'}), 400
+
+        if source == destination:
+            return jsonify({'error': 'Source and destination channels cannot be the same'}), 400
+
+        try:
+            message_limit = int(request.form.get('limit', ''))
+        except ValueError:
+            return jsonify({'error': 'Number of messages must be a number'}), 400
+        if not 0 < message_limit <= BACKFILL_MAX_MESSAGES:
+            return jsonify({'error': f'Number of messages must be between 1 and {BACKFILL_MAX_MESSAGES}'}), 400
+
+        # Format channel IDs
+        if not source.startswith('-100'):
+            source = f"-100{source.lstrip('-')}"
+        if not destination.startswith('-100'):
+            destination = f"-100{destination.lstrip('-')}"
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT telegram_id FROM telegram_accounts
+                    WHERE user_id = %s AND is_primary = true AND is_active = true
+                """, (user_id,))
+                account = cur.fetchone()
+                if not account:
+                    return jsonify({'error': 'Please authorize your Telegram account first'}), 400
+
+                job_id = backfill.create_job(cur, user_id, account[0], source, destination, message_limit)
+
+                # The worker running this account's session picks the job up
+                notify_change(cur, 'backfill', user_id)
+
+                logger.info(f"✅ Queued backfill {job_id} of {message_limit} messages {source} → {destination} for user {user_id}")
+                return jsonify({'message': 'Backfill started', 'id': job_id})
+
+    except Exception as e:
+        logger.error(f"❌ Start backfill error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/backfill/jobs')
+@login_required
+def backfill_jobs():
+    """Progress of the user's backfill jobs"""
+    try:
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                jobs = backfill.list_jobs(cur, session.get('user_id'))
+        return jsonify([backfill_job_json(job) for job in jobs])
+
+    except Exception as e:
+        logger.error(f"❌ Backfill jobs error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/backfill/<int:job_id>/<action>', methods=['POST'])
+@login_required
+def control_backfill(job_id, action):
+    """Pause, resume or cancel a backfill job"""
+    try:
+        if action not in backfill.TRANSITIONS:
+            return jsonify({'error': 'Unknown action'}), 404
+
+        user_id = session.get('user_id')
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                status = backfill.change_status(cur, job_id, user_id, action)
+                if not status:
+                    return jsonify({'error': f'Cannot {action} this backfill now'}), 400
+
+                notify_change(cur, 'backfill', user_id)
+
+                logger.info(f"✅ Backfill {job_id} of user {user_id} is now {status}")
+                return jsonify({'message': f'Backfill {status}', 'status': status})
+
+    except Exception as e:
+        logger.error(f"❌ Backfill {action} error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/bot/toggle', methods=['POST'])
 @login_required
 def toggle_bot():
@@ -841,22 +1209,14 @@ def toggle_bot():
         with get_db() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cur:
                 # Get primary telegram account
-                cur.execute("""
-                    SELECT telegram_id, session_string
-                    FROM telegram_accounts
-                    WHERE user_id = %s AND is_primary = true AND is_active = true
-                """, (user_id,))
+                cur.execute(queries.PRIMARY_ACCOUNT_QUERY, (user_id,))
                 primary_account = cur.fetchone()
 
                 if not primary_account:
                     return jsonify({'error': 'Please authorize Telegram first'}), 401
 
                 # Get forwarding config
-                cur.execute("""
-                    SELECT source_channel, destination_channel, is_active
-                    FROM forwarding_configs
-                    WHERE user_id = %s
-                """, (user_id,))
+                cur.execute(queries.FORWARDING_CONFIG_QUERY, (user_id,))
                 config = cur.fetchone()
 
                 if not config:
@@ -876,32 +1236,9 @@ def toggle_bot():
                         if not cur.fetchone():
                             return jsonify({'error': 'Failed to update forwarding status'}), 500
 
-                        # Start bot
-                        import main
-                        source_channel = str(config['source_channel'])
-                        dest_channel = str(config['destination_channel'])
-
-                        # Ensure proper channel ID format
-                        if not source_channel.startswith('-100'):
-                            source_channel = f"-100{source_channel.lstrip('-')}"
-                        if not dest_channel.startswith('-100'):
-                            dest_channel = f"-100{dest_channel.lstrip('-')}"
-
-                        success = main.add_user_session(
-                            user_id=int(primary_account['telegram_id']),
-                                                        session_string=primary_account['session_string'],
-                            source_channel=source_channel,
-                            destination_channel=dest_channel
-                        )
-
-                        if not success:
-                            # Rollback on failure
-                            cur.execute("""
-                                UPDATE forwarding_configs 
-                                SET is_active = false 
-                                WHERE user_id = %s
-                            """, (user_id,))
-                            return jsonify({'error': 'Failed to start bot. Please try again.'}), 500
+                        # Start bot: the owning forwarding worker picks this up immediately
+                        notify_change(cur, 'status', user_id)
+                        overview_cache.invalidate(user_id)
 
                         return jsonify({
                             'status': True,
@@ -928,8 +1265,8 @@ def toggle_bot():
                         """, (user_id,))
 
                         # Stop bot
-                        import main
-                        main.remove_user_session(primary_account['telegram_id'])
+                        notify_change(cur, 'status', user_id)
+                        overview_cache.invalidate(user_id)
 
                         return jsonify({
                             'status': False,
@@ -1011,8 +1348,8 @@ def add_replacement():
                     logger.info(f"Added replacement {replacement_id} for user {user_id}: '{original}' → '{replacement}'")
 
                     # Update bot replacements if running
-                    import main
-                    main.update_user_replacements(session.get('telegram_id'))
+                    notify_change(cur, 'replacements', user_id)
+                    overview_cache.invalidate(user_id)
 
                     return jsonify({
                         'message': 'Replacement added successfully',                        'original': original,
@@ -1051,8 +1388,8 @@ def remove_replacement():
                     logger.info(f"Removed replacement {result[0]} for user {user_id}")
 
                     # Update bot replacements if running
-                    import main
-                    main.update_user_replacements(session.get('telegram_id'))
+                    notify_change(cur, 'replacements', user_id)
+                    overview_cache.invalidate(user_id)
 
                     return jsonify({'message': 'Replacement removed successfully'})
                 else:
@@ -1075,9 +1412,9 @@ def clear_replacements():
                     WHERE user_id = %s
                 """, (user_id,))
 
-        # Update bot
-        import main
-        main.update_user_replacements(session.get('telegram_id'))
+                # Update bot
+                notify_change(cur, 'replacements', user_id)
+                overview_cache.invalidate(user_id)
 
         return jsonify({'message': 'All replacements cleared'})
     except Exception as e:
@@ -1095,11 +1432,7 @@ def toggle_replacement():
         with get_db() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cur:
                 # First check if replacement exists and belongs to user
-                cur.execute("""
-                    SELECT id, is_active 
-                    FROM text_replacements 
-                    WHERE user_id = %s AND original_text = %s
-                """, (session.get('user_id'), original))
+                cur.execute(queries.REPLACEMENT_BY_ORIGINAL_QUERY, (session.get('user_id'), original))
                 replacement = cur.fetchone()
 
                 if not replacement:
@@ -1115,9 +1448,9 @@ def toggle_replacement():
 
                 new_status = cur.fetchone()['is_active']
 
-                # Update replacements in memory
-                import main
-                main.update_user_replacements(session.get('telegram_id'))
+                # Update replacements in the running bot
+                notify_change(cur, 'replacements', session.get('user_id'))
+                overview_cache.invalidate(session.get('user_id'))
 
                 return jsonify({'success': True, 'is_active': new_status})
 
@@ -1157,20 +1490,7 @@ def accounts():
         with get_db() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cur:
                 # Get all telegram accounts with their forwarding configs
-                cur.execute("""
-                    SELECT 
-                        ta.*,
-                        fc.source_channel,
-                        fc.destination_channel,
-                        fc.is_active as forwarding_active,
-                        COUNT(fl.id) as messages_count
-                    FROM telegram_accounts ta
-                    LEFT JOIN forwarding_configs fc ON fc.user_id = ta.user_id 
-                    LEFT JOIN forwarding_logs fl ON fl.user_id = ta.user_id 
-                    WHERE ta.user_id = %s
-                    GROUP BY ta.id, fc.id
-                    ORDER BY ta.is_primary DESC, ta.auth_date DESC
-                """, (user_id,))
+                cur.execute(queries.ACCOUNTS_QUERY, (user_id,))
                 accounts = cur.fetchall()
 
                 return render_template('dashboard/accounts.html', accounts=accounts)
@@ -1180,5 +1500,15 @@ def accounts():
         flash('Failed to load accounts dashboard', 'error')
         return redirect(url_for('dashboard'))
 
+# Bring the schema up to date before serving (a no-op once migrated)
+try:
+    migrate.migrate(db_url)
+except Exception as e:
+    logger.error(f"❌ Database migration error: {str(e)}")
+
+# Run forwarding sessions in this process unless dedicated workers own them
+if not main.WORKER_MODE:
+    main.start_embedded_worker()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
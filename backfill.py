@@ -0,0 +1,209 @@
+import logging
+from psycopg2.extras import DictCursor
+import outbox
+from catchup import iter_pages, wait_for_outbox
+
+logger = logging.getLogger(__name__)
+
+# Jobs a worker should be running; the others are waiting on the user or finished
+ACTIVE_STATUSES = ('pending', 'running')
+
+# Which statuses each dashboard action may move a job out of
+TRANSITIONS = {
+    'pause': (('pending', 'running'), 'paused'),
+    'resume': (('paused', 'failed'), 'pending'),
+    'cancel': (('pending', 'running', 'paused', 'failed'), 'cancelled'),
+}
+
+JOB_COLUMNS = """
+    id, telegram_id, source_channel, destination_channel, message_limit, status,
+    start_after_id, end_at_id, checkpoint_id, messages_copied, last_error,
+    created_at, updated_at, finished_at
+"""
+
+LIST_JOBS_QUERY = f"""
+    SELECT {JOB_COLUMNS}
+    FROM backfill_jobs
+    WHERE user_id = %s
+    ORDER BY id DESC
+    LIMIT %s
+"""
+
+ACTIVE_JOBS_QUERY = f"""
+    SELECT {JOB_COLUMNS}
+    FROM backfill_jobs
+    WHERE telegram_id = ANY(%s) AND status = ANY(%s)
+    ORDER BY id
+"""
+
+
+def create_job(cur, user_id, telegram_id, source_channel, destination_channel, message_limit):
+    """Queue a backfill of the newest `message_limit` posts of a source into a destination"""
+    cur.execute("""
+        INSERT INTO backfill_jobs (user_id, telegram_id, source_channel, destination_channel, message_limit)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+    """, (user_id, telegram_id, source_channel, destination_channel, message_limit))
+    return cur.fetchone()[0]
+
+
+def list_jobs(cur, user_id, limit=20):
+    """A user's most recent backfill jobs, newest first"""
+    cur.execute(LIST_JOBS_QUERY, (user_id, limit))
+    return [dict(row) for row in cur.fetchall()]
+
+
+def change_status(cur, job_id, user_id, action):
+    """Apply a dashboard action to a job; returns the new status, or None if not allowed"""
+    allowed, status = TRANSITIONS[action]
+    cur.execute("""
+        UPDATE backfill_jobs
+        SET status = %s, updated_at = CURRENT_TIMESTAMP,
+            finished_at = CASE WHEN %s = 'cancelled' THEN CURRENT_TIMESTAMP END
+        WHERE id = %s AND user_id = %s AND status = ANY(%s)
+        RETURNING status
+    """, (status, status, job_id, user_id, list(allowed)))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def active_jobs(conn, telegram_ids):
+    """Jobs that should be running for the given accounts"""
+    with conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(ACTIVE_JOBS_QUERY, (list(telegram_ids), list(ACTIVE_STATUSES)))
+        return [dict(row) for row in cur.fetchall()]
+
+
+def job_sources(conn, telegram_id):
+    """Every source an account has backfilled from, whatever became of the job"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT source_channel FROM backfill_jobs
+            WHERE telegram_id = %s
+        """, (telegram_id,))
+        return [row[0] for row in cur.fetchall()]
+
+
+def job_status(conn, job_id):
+    """Current status of a job"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT status FROM backfill_jobs WHERE id = %s", (job_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def start_job(conn, job_id, start_after_id, end_at_id):
+    """Mark a job running, fixing its message range the first time it starts"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE backfill_jobs
+            SET status = 'running', last_error = NULL, updated_at = CURRENT_TIMESTAMP,
+                start_after_id = COALESCE(start_after_id, %s),
+                end_at_id = COALESCE(end_at_id, %s)
+            WHERE id = %s AND status = ANY(%s)
+            RETURNING status
+        """, (start_after_id, end_at_id, job_id, list(ACTIVE_STATUSES)))
+        return cur.fetchone() is not None
+
+
+def save_checkpoint(conn, job_id, checkpoint_id, copied):
+    """Record that every message up to checkpoint_id has been queued"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE backfill_jobs
+            SET checkpoint_id = %s, messages_copied = messages_copied + %s, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (checkpoint_id, copied, job_id))
+
+
+def finish_job(conn, job_id, status, error=None):
+    """Mark a running job done or failed"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE backfill_jobs
+            SET status = %s, last_error = %s, updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = 'running'
+        """, (status, error, job_id))
+
+
+class BackfillRunner:
+    """Copies a source's history into one destination through the outbox.
+
+    On first start the job's range is fixed: the newest `message_limit`
+    messages up to the newest one at that moment. Messages are then read
+    oldest first in pages, transformed by `outbox_entries` exactly like live
+    messages and queued for the job's destination only. The checkpoint is
+    saved after every page, so a paused, restarted or crashed job resumes
+    where it left off. Like catch-up, a page is only queued once the
+    account's outbox has drained, which keeps live traffic flowing; the
+    forwarding log sink then writes the ID mappings in bulk.
+    """
+
+    def __init__(self, client, entities, db_pool, job, outbox_entries, wake, page_size=500, poll_interval=1.0):
+        self.client = client
+        self.entities = entities
+        self.db_pool = db_pool
+        self.job = job
+        self.outbox_entries = outbox_entries
+        self.wake = wake
+        self.page_size = page_size
+        self.poll_interval = poll_interval
+
+    async def _resolve_range(self, peer):
+        """Find the ID range covering the newest message_limit messages of the source"""
+        job = self.job
+        if job['end_at_id'] is not None:
+            return job['start_after_id'], job['end_at_id']
+        newest = await self.client.get_messages(peer, limit=1)
+        if not newest:
+            return 0, 0
+        before = await self.client.get_messages(peer, limit=1, add_offset=job['message_limit'])
+        return (before[0].id if before else 0), newest[0].id
+
+    async def run(self):
+        """Run the job until it is finished, paused or cancelled"""
+        job = self.job
+        job_id = job['id']
+        try:
+            peer = await self.entities.get(job['source_channel'])
+            start_after_id, end_at_id = await self._resolve_range(peer)
+            if not await self.db_pool.run(start_job, job_id, start_after_id, end_at_id):
+                return
+            logger.info(f"📥 Backfill {job_id}: copying {job['source_channel']} → {job['destination_channel']} "
+                        f"(messages {start_after_id + 1}-{end_at_id})")
+
+            copied = job['messages_copied']
+            pages = iter_pages(
+                self.client, peer,
+                min_id=max(start_after_id, job['checkpoint_id'] or 0),
+                max_id=end_at_id + 1,
+                page_size=self.page_size
+            )
+            async for page in pages:
+                await wait_for_outbox(self.db_pool, job['telegram_id'], self.page_size, self.poll_interval)
+
+                # Paused or cancelled from the dashboard: stop before queueing more
+                status = await self.db_pool.run(job_status, job_id)
+                if status != 'running':
+                    logger.info(f"Backfill {job_id} {status} after {copied} messages")
+                    return
+
+                destination = [job['destination_channel']]
+                entries = [entry for messages in page for entry in self.outbox_entries(messages, destination)]
+                await self.db_pool.run(outbox.enqueue, entries)
+                self.wake()
+
+                count = sum(len(messages) for messages in page)
+                copied += count
+                await self.db_pool.run(save_checkpoint, job_id, page[-1][-1].id, count)
+                logger.info(f"⏳ Backfill {job_id}: {copied}/{job['message_limit']} messages queued")
+
+            await self.db_pool.run(finish_job, job_id, 'done')
+            logger.info(f"✅ Backfill {job_id} finished: {copied} messages queued")
+
+        except Exception as e:
+            logger.error(f"❌ Backfill {job_id} failed: {str(e)}")
+            try:
+                await self.db_pool.run(finish_job, job_id, 'failed', str(e))
+            except Exception as db_error:
+                logger.error(f"❌ Could not record backfill {job_id} failure: {str(db_error)}")
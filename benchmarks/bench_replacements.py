@@ -0,0 +1,66 @@
+"""Compare the compiled ReplacementEngine with the old per-rule replace loop.
+
+Up to replacements.SCAN_MAX_RULES rules the engine finds each rule with str.find;
+above that it uses the compiled regex.
+
+Usage: python benchmarks/bench_replacements.py [--rules 10 100 500] [--runs 200]
+"""
+import os
+import sys
+import random
+import string
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replacements import ReplacementEngine
+
+
+def legacy_apply(text, replacements):
+    """The previous apply_text_replacements loop: sort, then one scan per rule"""
+    result = text
+    for original, replacement in sorted(replacements.items(), key=lambda x: len(x[0]), reverse=True):
+        if original in result:
+            result = result.replace(original, replacement)
+    return result
+
+
+def make_rules(count, rng):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12))))
+    return {word: word.upper() for word in words}
+
+
+def make_text(rules, length, rng):
+    vocabulary = list(rules) + [''.join(rng.choices(string.ascii_lowercase, k=6)) for _ in range(200)]
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(vocabulary))
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, nargs='+', default=[10, 100, 500, 2000])
+    parser.add_argument('--length', type=int, default=2000, help="message length in characters")
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'rules':>6} {'legacy µs':>12} {'engine µs':>12} {'compile ms':>12} {'speedup':>8}")
+    for count in args.rules:
+        rules = make_rules(count, rng)
+        text = make_text(rules, args.length, rng)
+
+        compile_ms = timeit.timeit(lambda: ReplacementEngine(rules), number=5) / 5 * 1000
+        engine = ReplacementEngine(rules)
+        legacy_us = timeit.timeit(lambda: legacy_apply(text, rules), number=args.runs) / args.runs * 1e6
+        engine_us = timeit.timeit(lambda: engine.apply(text), number=args.runs) / args.runs * 1e6
+
+        print(f"{count:>6} {legacy_us:>12.1f} {engine_us:>12.1f} {compile_ms:>12.2f} {legacy_us / engine_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import logging
+import asyncio
+from telethon.tl import types
+import outbox
+
+logger = logging.getLogger(__name__)
+
+LAST_FORWARDED_QUERY = """
+    SELECT MAX(source_message_id)
+    FROM forwarding_logs
+    WHERE user_id = %s AND source_chat_id = %s
+"""
+
+
+def last_forwarded(conn, user_id, source_chat_ids):
+    """Return {source_chat_id: newest forwarded source message ID} for the sources with any logs"""
+    last = {}
+    with conn.cursor() as cur:
+        for source_chat_id in source_chat_ids:
+            cur.execute(LAST_FORWARDED_QUERY, (user_id, source_chat_id))
+            message_id = cur.fetchone()[0]
+            if message_id is not None:
+                last[source_chat_id] = message_id
+    return last
+
+
+async def iter_pages(client, peer, min_id=0, max_id=0, page_size=100, limit=None):
+    """Yield a chat's messages after min_id (and before max_id), oldest first, as pages.
+
+    A page is a list of items, each a list holding one message or every
+    item of an album, so albums are never split across pages.
+    """
+    page = []
+    album = []
+    async for message in client.iter_messages(peer, min_id=min_id, max_id=max_id, reverse=True, limit=limit):
+        if isinstance(message, types.MessageService):
+            continue
+        if album and message.grouped_id != album[0].grouped_id:
+            page.append(album)
+            album = []
+        if message.grouped_id:
+            album.append(message)
+        else:
+            page.append([message])
+
+        if len(page) >= page_size:
+            yield page
+            page = []
+
+    if album:
+        page.append(album)
+    if page:
+        yield page
+
+
+async def wait_for_outbox(db_pool, user_id, below, poll_interval=1.0):
+    """Wait until fewer than `below` of an account's outbox entries are left to send"""
+    while await db_pool.run(outbox.pending_count, user_id) >= below:
+        await asyncio.sleep(poll_interval)
+
+
+class CatchUp:
+    """Replays what a session's sources posted while it was down.
+
+    For every source that has been forwarded from before, the messages
+    after the newest forwarded one are paged through oldest first and
+    queued in the outbox page by page, album items kept together. The
+    outbox's idempotency key skips anything already queued, so replaying
+    overlaps with live traffic harmlessly. A new page is only queued once
+    the account's outbox has drained below page_size, so live messages
+    never wait behind more than one page of backlog; the sends themselves
+    go through the account's rate-limited send queue.
+    """
+
+    def __init__(self, client, entities, db_pool, user_id, outbox_entries, wake, page_size=100, limit=5000,
+                 poll_interval=1.0):
+        self.client = client
+        self.entities = entities
+        self.db_pool = db_pool
+        self.user_id = user_id
+        self.outbox_entries = outbox_entries
+        self.wake = wake
+        self.page_size = page_size
+        self.limit = limit
+        self.poll_interval = poll_interval
+
+    async def run(self, source_ids):
+        """Catch up every source; returns the number of messages queued"""
+        try:
+            last = await self.db_pool.run(last_forwarded, self.user_id, [int(source_id) for source_id in source_ids])
+        except Exception as e:
+            logger.error(f"❌ Catch-up lookup error for user {self.user_id}: {str(e)}")
+            return 0
+
+        total = 0
+        for source_id in source_ids:
+            # A source nothing was ever forwarded from has no gap to fill
+            if int(source_id) not in last:
+                continue
+            try:
+                total += await self.replay(source_id, last[int(source_id)])
+            except Exception as e:
+                logger.error(f"❌ Catch-up of {source_id} for user {self.user_id} failed: {str(e)}")
+        return total
+
+    async def replay(self, source_id, min_id):
+        """Queue the messages of one source newer than min_id, in order"""
+        queued = 0
+        peer = await self.entities.get(source_id)
+        async for page in iter_pages(self.client, peer, min_id=min_id, page_size=self.page_size,
+                                     limit=self.limit or None):
+            # Live messages never wait behind more than one page of backlog
+            await wait_for_outbox(self.db_pool, self.user_id, self.page_size, self.poll_interval)
+
+            entries = [entry for messages in page for entry in self.outbox_entries(messages)]
+            await self.db_pool.run(outbox.enqueue, entries)
+            self.wake()
+
+            count = sum(len(messages) for messages in page)
+            queued += count
+            logger.info(f"⏳ Catch-up of {source_id} for user {self.user_id}: "
+                        f"queued {queued} messages up to {page[-1][-1].id}")
+
+        if self.limit and queued >= self.limit:
+            logger.warning(f"⚠️ Catch-up of {source_id} for user {self.user_id} stopped at {self.limit} messages")
+        return queued
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from telethon import utils
+from telethon.errors import ChannelPrivateError
+from telethon.tl.types import ChannelForbidden, PeerChannel
+
+logger = logging.getLogger(__name__)
+
+CHANNELS_QUERY = """
+    SELECT channel_id, name
+    FROM telegram_channels
+    WHERE telegram_id = %s
+    ORDER BY name
+"""
+
+
+def load_channels(cur, telegram_id):
+    """Return the cached channel list for an account and when it was last fully refreshed"""
+    cur.execute(CHANNELS_QUERY, (telegram_id,))
+    channels = [{'id': str(row[0]), 'name': row[1]} for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT refreshed_at FROM channel_catalog_refreshes WHERE telegram_id = %s
+    """, (telegram_id,))
+    row = cur.fetchone()
+    return channels, row[0] if row else None
+
+
+def is_stale(refreshed_at, ttl):
+    """Whether a catalogue refreshed at `refreshed_at` is older than `ttl` seconds"""
+    if refreshed_at is None:
+        return True
+    return (datetime.now(timezone.utc) - refreshed_at).total_seconds() > ttl
+
+
+def replace_channels(cur, telegram_id, channels):
+    """Store a full channel listing, dropping channels the account has left"""
+    rows = [(telegram_id, int(channel['id']), channel['name']) for channel in channels]
+    if rows:
+        execute_values(cur, """
+            INSERT INTO telegram_channels (telegram_id, channel_id, name)
+            VALUES %s
+            ON CONFLICT (telegram_id, channel_id) DO UPDATE
+            SET name = EXCLUDED.name, updated_at = CURRENT_TIMESTAMP
+        """, rows)
+    cur.execute("""
+        DELETE FROM telegram_channels
+        WHERE telegram_id = %s AND NOT (channel_id = ANY(%s))
+    """, (telegram_id, [row[1] for row in rows]))
+    cur.execute("""
+        INSERT INTO channel_catalog_refreshes (telegram_id, refreshed_at)
+        VALUES (%s, CURRENT_TIMESTAMP)
+        ON CONFLICT (telegram_id) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+    """, (telegram_id,))
+
+
+def upsert_channel(cur, telegram_id, channel_id, name):
+    """Add or rename a single channel in an account's catalogue"""
+    cur.execute("""
+        INSERT INTO telegram_channels (telegram_id, channel_id, name)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (telegram_id, channel_id) DO UPDATE
+        SET name = EXCLUDED.name, updated_at = CURRENT_TIMESTAMP
+    """, (telegram_id, channel_id, name))
+
+
+def remove_channel(cur, telegram_id, channel_id):
+    """Drop a channel the account can no longer see"""
+    cur.execute("""
+        DELETE FROM telegram_channels WHERE telegram_id = %s AND channel_id = %s
+    """, (telegram_id, channel_id))
+
+
+async def fetch_channels(client):
+    """Walk the account's dialogs and collect every channel"""
+    channels = []
+    async for dialog in client.iter_dialogs():
+        if dialog.is_channel:
+            channel_id = str(dialog.id)
+            if not channel_id.startswith('-100'):
+                channel_id = f'-100{channel_id.lstrip("-")}'
+            channels.append({
+                'id': channel_id,
+                'name': dialog.name
+            })
+    return channels
+
+
+class ChannelUpdates:
+    """Apply UpdateChannel (joined, left or renamed) to an account's catalogue.
+
+    UpdateChannel fires for any change in any channel the account is in, so the
+    channel is read from the entities Telegram sends along with the update. Only
+    when it is missing is it fetched, once per channel per `delay` seconds.
+    """
+
+    def __init__(self, client, db_pool, telegram_id, delay=5.0):
+        self.client = client
+        self.db_pool = db_pool
+        self.telegram_id = telegram_id
+        self.delay = delay
+        self._pending = {}
+        self._names = {}
+
+    async def handle(self, update):
+        channel_id = utils.get_peer_id(PeerChannel(update.channel_id))
+        entity = getattr(update, '_entities', {}).get(channel_id)
+        if entity is not None:
+            await self._apply(channel_id, entity)
+        elif channel_id not in self._pending:
+            self._pending[channel_id] = asyncio.get_running_loop().create_task(self._fetch(update.channel_id))
+
+    async def _fetch(self, peer_id):
+        """Fetch a channel the update didn't carry, after a burst of updates for it has settled"""
+        channel_id = utils.get_peer_id(PeerChannel(peer_id))
+        try:
+            await asyncio.sleep(self.delay)
+            try:
+                entity = await self.client.get_entity(PeerChannel(peer_id))
+            except (ChannelPrivateError, ValueError):
+                entity = None
+            await self._apply(channel_id, entity)
+        except Exception as e:
+            logger.error(f"❌ Channel catalogue update error: {str(e)}")
+        finally:
+            self._pending.pop(channel_id, None)
+
+    async def _apply(self, channel_id, entity):
+        if entity is None or isinstance(entity, ChannelForbidden) or getattr(entity, 'left', False):
+            self._names.pop(channel_id, None)
+
+            def _remove(conn):
+                with conn.cursor() as cur:
+                    remove_channel(cur, self.telegram_id, channel_id)
+            await self.db_pool.run(_remove)
+            logger.info(f"Channel {channel_id} removed from catalogue of {self.telegram_id}")
+            return
+
+        # Most updates don't touch the name; those need no write
+        name = utils.get_display_name(entity)
+        if self._names.get(channel_id) == name:
+            return
+
+        def _upsert(conn):
+            with conn.cursor() as cur:
+                upsert_channel(cur, self.telegram_id, channel_id, name)
+        await self.db_pool.run(_upsert)
+        self._names[channel_id] = name
+        logger.info(f"Channel {channel_id} updated in catalogue of {self.telegram_id}")
+
+    def close(self):
+        """Cancel the pending fetches"""
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
@@ -0,0 +1,182 @@
+import os
+import logging
+import threading
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import DictCursor
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no database connection becomes available in time"""
+
+
+class DatabasePool:
+    """Bounded, health-checked psycopg2 pool with an asyncio front-end.
+
+    Blocking psycopg2 calls run on a dedicated thread pool sized to the
+    connection limit, so coroutines awaiting the database never block the
+    Telethon event loop. The pool is thread-safe and loop-agnostic: every
+    user session may share one instance regardless of which loop it runs on.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, acquire_timeout=10.0, health_check_interval=30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._executor = ThreadPoolExecutor(max_workers=maxconn, thread_name_prefix='db-pool')
+
+    def _get_pool(self):
+        """Create the underlying connection pool on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = pool.ThreadedConnectionPool(
+                        minconn=self.minconn,
+                        maxconn=self.maxconn,
+                        dsn=self.dsn
+                    )
+                    logger.info(f"✅ Database pool initialized (max {self.maxconn} connections)")
+        return self._pool
+
+    def _is_healthy(self, conn):
+        """Check a connection that has been idle longer than the health check interval"""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self, deadline):
+        """Take a healthy connection from the pool, waiting until the deadline"""
+        remaining = max(0.0, deadline - time.monotonic())
+        if not self._slots.acquire(timeout=remaining):
+            raise PoolTimeout(f"No database connection available within {self.acquire_timeout}s")
+
+        try:
+            db_pool = self._get_pool()
+            for _ in range(2):
+                conn = db_pool.getconn()
+                conn.autocommit = True
+                if self._is_healthy(conn):
+                    return conn
+                logger.warning("⚠️ Discarding broken database connection")
+                self._last_used.pop(id(conn), None)
+                db_pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it is no longer usable"""
+        try:
+            discard = discard or conn.closed
+            if discard:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            self._get_pool().putconn(conn, close=discard)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection synchronously (for threads outside the event loop)"""
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        conn = self._checkout(deadline)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self._checkin(conn, discard)
+
+    def _run_sync(self, fn, deadline, args):
+        conn = self._checkout(deadline)
+        discard = False
+        try:
+            return fn(conn, *args)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self._checkin(conn, discard)
+
+    async def run(self, fn, *args, timeout=None):
+        """Run fn(conn, *args) on a pooled connection without blocking the event loop"""
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run_sync, fn, deadline, args)
+
+    async def execute(self, query, params=None, timeout=None):
+        """Execute a statement and return the affected row count"""
+        def _execute(conn):
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.rowcount
+        return await self.run(_execute, timeout=timeout)
+
+    async def fetchone(self, query, params=None, timeout=None):
+        """Execute a query and return the first row as a DictRow"""
+        def _fetchone(conn):
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, params)
+                return cur.fetchone()
+        return await self.run(_fetchone, timeout=timeout)
+
+    async def fetchall(self, query, params=None, timeout=None):
+        """Execute a query and return all rows as DictRows"""
+        def _fetchall(conn):
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+        return await self.run(_fetchall, timeout=timeout)
+
+    def close(self):
+        """Close every pooled connection and stop the worker threads"""
+        self._executor.shutdown(wait=True)
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+        self._last_used.clear()
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Get the process-wide database pool, configured from the environment"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = DatabasePool(
+                    os.getenv('DATABASE_URL'),
+                    minconn=int(os.getenv('DB_POOL_MIN', '1')),
+                    maxconn=int(os.getenv('DB_POOL_MAX', '10')),
+                    acquire_timeout=float(os.getenv('DB_ACQUIRE_TIMEOUT', '10')),
+                    health_check_interval=float(os.getenv('DB_HEALTH_CHECK_INTERVAL', '30'))
+                )
+    return _db_pool
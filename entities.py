@@ -0,0 +1,78 @@
+import logging
+import time
+from telethon import utils
+from telethon.errors import ChannelInvalidError, PeerIdInvalidError
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean a cached peer (usually its access hash) is no longer valid
+STALE_PEER_ERRORS = (ChannelInvalidError, PeerIdInvalidError)
+
+
+class EntityCache:
+    """Per-client cache of resolved InputPeers for the chats a session talks to.
+
+    Peers are resolved once (at session start via preload()) and reused
+    until they expire after `ttl` seconds or Telegram rejects them, so the
+    steady-state forward path makes no extra API calls besides the send.
+    """
+
+    def __init__(self, client, ttl=3600):
+        self.client = client
+        self.ttl = ttl
+        self._peers = {}
+
+    async def _from_dialogs(self, chat_id):
+        """Find the chat among the account's dialogs, which carry its current access hash.
+
+        get_entity(chat_id) won't do: it sends the session's stored hash,
+        which is the one Telegram just rejected.
+        """
+        async for dialog in self.client.iter_dialogs():
+            if dialog.id == chat_id:
+                return utils.get_input_peer(dialog.entity)
+        raise ValueError(f"Chat {chat_id} is not among the account's dialogs")
+
+    async def _resolve(self, chat_id, refresh=False):
+        if refresh:
+            peer = await self._from_dialogs(chat_id)
+        else:
+            try:
+                peer = await self.client.get_input_entity(chat_id)
+            except ValueError:
+                # Not in the session's cache yet (no update has mentioned it since start-up)
+                peer = await self._from_dialogs(chat_id)
+        self._peers[chat_id] = (peer, time.monotonic())
+        return peer
+
+    async def get(self, chat_id):
+        """Get the InputPeer for a chat, resolving it if missing or expired"""
+        chat_id = int(chat_id)
+        cached = self._peers.get(chat_id)
+        if cached and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        return await self._resolve(chat_id)
+
+    def invalidate(self, chat_id):
+        self._peers.pop(int(chat_id), None)
+
+    async def preload(self, chat_ids):
+        """Resolve the given chats up front so the first message doesn't pay for it"""
+        for chat_id in chat_ids:
+            if not chat_id:
+                continue
+            try:
+                await self.get(chat_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not preload entity {chat_id}: {str(e)}")
+
+    async def call(self, chat_id, request):
+        """Run request(peer), refreshing the peer once if Telegram rejects it"""
+        peer = await self.get(chat_id)
+        try:
+            return await request(peer)
+        except STALE_PEER_ERRORS as e:
+            logger.warning(f"⚠️ Stale entity {chat_id} ({e.__class__.__name__}), refreshing")
+            self.invalidate(chat_id)
+            peer = await self._resolve(int(chat_id), refresh=True)
+            return await request(peer)
@@ -0,0 +1,153 @@
+import os
+import re
+import gzip
+import logging
+import argparse
+from datetime import datetime, timedelta
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key so only one process runs partition maintenance at a time
+LOCK_KEY = 7364202
+
+PARTITION_PATTERN = re.compile(r'^forwarding_logs_y(\d{4})m(\d{2})$')
+
+
+def month_start(moment):
+    """First instant of the month containing `moment`"""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(moment, months):
+    """First instant of the month `months` after the one containing `moment`"""
+    month = moment.month - 1 + months
+    return datetime(moment.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(start):
+    """Name of the partition holding the month starting at `start`"""
+    return f"forwarding_logs_y{start.year:04d}m{start.month:02d}"
+
+
+def is_partitioned(cur):
+    """Whether migration 006 has turned forwarding_logs into a partitioned table"""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('forwarding_logs')")
+    row = cur.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(cur):
+    """Return {name: month_start} for the monthly forwarding_logs partitions"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'forwarding_logs'::regclass
+    """)
+    partitions = {}
+    for (name,) in cur.fetchall():
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def ensure_partitions(cur, months_ahead=2, now=None):
+    """Create the partitions for this month and the next `months_ahead` months"""
+    existing = list_partitions(cur)
+    created = []
+    start = month_start(now or datetime.now())
+    for offset in range(months_ahead + 1):
+        month = add_months(start, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF forwarding_logs
+            FOR VALUES FROM (%s) TO (%s)
+        """, (month, add_months(month, 1)))
+        created.append(name)
+        logger.info(f"✅ Created forwarding_logs partition {name}")
+    return created
+
+
+def expired_partitions(cur, retention_days, now=None):
+    """Partitions whose every row is older than the retention window, oldest first"""
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    partitions = list_partitions(cur)
+    return sorted(
+        (name for name, start in partitions.items() if add_months(start, 1) <= cutoff),
+        key=partitions.get
+    )
+
+
+def archive_partition(cur, name, archive_dir):
+    """Export a partition as gzipped CSV; returns the archive path"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + '.partial'
+    with gzip.open(partial, 'wb') as f:
+        cur.copy_expert(f"COPY (SELECT * FROM {name} ORDER BY id) TO STDOUT WITH CSV HEADER", f)
+    os.replace(partial, path)
+    return path
+
+
+def drop_partition(cur, name):
+    """Detach and drop a partition; far cheaper than DELETEing its rows"""
+    cur.execute(f"ALTER TABLE forwarding_logs DETACH PARTITION {name}")
+    cur.execute(f"DROP TABLE {name}")
+
+
+def maintain(conn, retention_days=0, archive_dir=None, months_ahead=2):
+    """Create upcoming partitions and archive/drop the expired ones.
+
+    `conn` must be in autocommit mode. retention_days=0 keeps logs forever.
+    Returns False without doing anything if another process holds the lock.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            return False
+        try:
+            if not is_partitioned(cur):
+                logger.warning("⚠️ forwarding_logs isn't partitioned yet: apply migration 006 with `python migrate.py`")
+                return True
+            ensure_partitions(cur, months_ahead)
+            if retention_days > 0:
+                for name in expired_partitions(cur, retention_days):
+                    if archive_dir:
+                        path = archive_partition(cur, name, archive_dir)
+                        logger.info(f"✅ Archived {name} to {path}")
+                    drop_partition(cur, name)
+                    logger.info(f"✅ Dropped expired forwarding_logs partition {name}")
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+    return True
+
+
+def maintain_from_env(conn):
+    """Run maintenance with LOG_RETENTION_DAYS / LOG_ARCHIVE_DIR from the environment"""
+    return maintain(
+        conn,
+        retention_days=int(os.getenv('LOG_RETENTION_DAYS', '0')),
+        archive_dir=os.getenv('LOG_ARCHIVE_DIR') or None
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain forwarding_logs partitions")
+    parser.add_argument('--retention-days', type=int, default=int(os.getenv('LOG_RETENTION_DAYS', '0')),
+                        help="drop partitions older than this many days (0 keeps everything)")
+    parser.add_argument('--archive-dir', default=os.getenv('LOG_ARCHIVE_DIR'),
+                        help="export partitions here as .csv.gz before dropping them")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+    conn.autocommit = True
+    try:
+        if not maintain(conn, args.retention_days, args.archive_dir):
+            logger.warning("⚠️ Another process is already maintaining forwarding_logs partitions")
+    finally:
+        conn.close()
@@ -0,0 +1,239 @@
+import os
+import atexit
+import logging
+import queue
+import threading
+import time
+import asyncio
+from psycopg2.extras import execute_values
+from db import get_pool
+from metrics import DB_WRITE_SECONDS, LOG_SINK_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+LOG_COLUMNS = (
+    'user_id', 'source_message_id', 'dest_message_id', 'source_chat_id',
+    'dest_chat_id', 'message_text', 'received_at', 'forwarded_at',
+    'receive_ms', 'transform_ms', 'queue_ms', 'send_ms', 'persist_ms', 'total_ms'
+)
+
+
+class ForwardingLogSink:
+    """Write-behind sink that batches forwarding_logs rows into multi-VALUES inserts.
+
+    Records are queued in memory (bounded by max_queue) and flushed by a
+    background thread whenever max_batch rows are waiting or flush_interval
+    seconds have passed. When Postgres is slow the queue fills up and
+    submit() waits for space, pushing back on the producers instead of
+    growing without limit. close() drains everything still queued.
+
+    Each flush also bumps the per-account counters in forwarding_stats (in
+    the same statement as the insert), so dashboards never count log rows.
+    """
+
+    def __init__(self, db_pool, max_batch=500, flush_interval=1.0, max_queue=10000, submit_timeout=30.0):
+        self.db_pool = db_pool
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._failures = {}
+        self._stats = {
+            'rows_flushed': 0,
+            'batches_flushed': 0,
+            'flush_failures': 0,
+            'rows_dropped': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'avg_flush_ms': 0.0
+        }
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='forwarding-log-sink', daemon=True)
+            self._thread.start()
+            logger.info("✅ Forwarding log sink started")
+
+    def submit_nowait(self, record):
+        """Queue a record if there is room, returning False when the queue is full"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    async def submit(self, record):
+        """Queue a record, waiting for room while the sink is backed up"""
+        if self.submit_nowait(record):
+            return True
+
+        logger.warning(f"⚠️ Log sink backed up ({self._queue.qsize()} queued), waiting for database")
+        deadline = time.monotonic() + self.submit_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            if self.submit_nowait(record):
+                return True
+            delay = min(delay * 2, 0.5)
+
+        with self._stats_lock:
+            self._stats['rows_dropped'] += 1
+        logger.error(f"❌ Dropped forwarding log for message {record.get('source_message_id')}: sink full")
+        return False
+
+    def record_failure(self, user_id, count=1):
+        """Count failed forwards for an account; written out with the next flush"""
+        with self._stats_lock:
+            failed, _ = self._failures.get(user_id, (0, None))
+            self._failures[user_id] = (failed + count, time.time())
+
+    def _take_failures(self):
+        with self._stats_lock:
+            failures, self._failures = self._failures, {}
+        return failures
+
+    def _next_batch(self):
+        """Collect up to max_batch records, waiting at most flush_interval"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stopping.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, conn, batch):
+        # Persist latency: how long each record waited here before being written
+        written_at = time.time()
+        for record in batch:
+            record['persist_ms'] = round((written_at - record['created_at']) * 1000)
+        rows = [
+            tuple(record[column] for column in LOG_COLUMNS) + (record['created_at'],)
+            for record in batch
+        ]
+        with conn.cursor() as cur:
+            execute_values(cur, f"""
+                WITH inserted AS (
+                    INSERT INTO forwarding_logs ({', '.join(LOG_COLUMNS)}, created_at)
+                    VALUES %s
+                    RETURNING user_id, created_at
+                )
+                INSERT INTO forwarding_stats (telegram_id, messages_forwarded, last_forwarded_at)
+                SELECT user_id, COUNT(*), MAX(created_at) FROM inserted GROUP BY user_id
+                ON CONFLICT (telegram_id) DO UPDATE
+                SET messages_forwarded = forwarding_stats.messages_forwarded + EXCLUDED.messages_forwarded,
+                    last_forwarded_at = GREATEST(forwarding_stats.last_forwarded_at, EXCLUDED.last_forwarded_at)
+            """, rows, template=f"({', '.join(['%s'] * len(LOG_COLUMNS))}, to_timestamp(%s))",
+                page_size=len(rows))
+
+    def _write_failures(self, conn, failures):
+        rows = [(user_id, count, failed_at) for user_id, (count, failed_at) in failures.items()]
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO forwarding_stats (telegram_id, failures, last_failure_at)
+                VALUES %s
+                ON CONFLICT (telegram_id) DO UPDATE
+                SET failures = forwarding_stats.failures + EXCLUDED.failures,
+                    last_failure_at = GREATEST(forwarding_stats.last_failure_at, EXCLUDED.last_failure_at)
+            """, rows, template="(%s, %s, to_timestamp(%s))")
+
+    def _flush(self, batch, failures=None):
+        """Write a batch and failure counts, retrying with backoff until it succeeds or the sink stops"""
+        rows = len(batch)
+        delay = 0.5
+        attempts = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                with self.db_pool.connection() as conn:
+                    if batch:
+                        self._write_batch(conn, batch)
+                        batch = []
+                    if failures:
+                        self._write_failures(conn, failures)
+                self._record_flush(rows, (time.perf_counter() - started) * 1000)
+                return
+            except Exception as e:
+                attempts += 1
+                with self._stats_lock:
+                    self._stats['flush_failures'] += 1
+                if self._stopping.is_set() and attempts >= 3:
+                    with self._stats_lock:
+                        self._stats['rows_dropped'] += len(batch)
+                    logger.error(f"❌ Dropped {len(batch)} forwarding logs and {len(failures or {})} failure counts on shutdown: {str(e)}")
+                    return
+                logger.error(f"❌ Forwarding log flush failed ({len(batch)} rows), retrying in {delay}s: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _record_flush(self, rows, elapsed_ms):
+        if not rows:
+            return
+        DB_WRITE_SECONDS.observe(elapsed_ms / 1000, operation='forwarding_logs')
+        with self._stats_lock:
+            stats = self._stats
+            stats['rows_flushed'] += rows
+            stats['batches_flushed'] += 1
+            stats['last_flush_ms'] = elapsed_ms
+            stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+            stats['avg_flush_ms'] += (elapsed_ms - stats['avg_flush_ms']) / stats['batches_flushed']
+        logger.debug(f"Flushed {rows} forwarding logs in {elapsed_ms:.1f}ms ({self._queue.qsize()} queued)")
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            failures = self._take_failures()
+            if batch or failures:
+                self._flush(batch, failures)
+
+    def stats(self):
+        """Return queue depth and flush latency metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        return stats
+
+    def close(self, timeout=30.0):
+        """Stop accepting work and flush everything still queued"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"❌ Log sink did not drain within {timeout}s ({self._queue.qsize()} rows left)")
+        else:
+            logger.info(f"✅ Forwarding log sink drained: {self.stats()}")
+        self._thread = None
+
+
+_log_sink = None
+_log_sink_lock = threading.Lock()
+
+
+def get_log_sink():
+    """Get the process-wide forwarding log sink, starting it on first use"""
+    global _log_sink
+    if _log_sink is None:
+        with _log_sink_lock:
+            if _log_sink is None:
+                sink = ForwardingLogSink(
+                    get_pool(),
+                    max_batch=int(os.getenv('LOG_SINK_BATCH_SIZE', '500')),
+                    flush_interval=float(os.getenv('LOG_SINK_FLUSH_INTERVAL', '1.0')),
+                    max_queue=int(os.getenv('LOG_SINK_MAX_QUEUE', '10000'))
+                )
+                sink.start()
+                atexit.register(sink.close)
+                LOG_SINK_QUEUE_DEPTH.set_function(sink._queue.qsize)
+                _log_sink = sink
+    return _log_sink
@@ -1,13 +1,34 @@
 import os
+import argparse
+import atexit
 import logging
-import threading
+import multiprocessing
+import signal
+import socket
 import time
-from datetime import datetime
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, types
 from telethon.sessions import StringSession
 import asyncio
-import psycopg2
 from psycopg2.extras import DictCursor
+from db import get_pool
+from log_sink import get_log_sink
+from message_map import get_message_map
+from supervisor import ForwardingSupervisor
+from sharding import HashRing, WorkerCoordinator
+from replacements import ReplacementEngine
+from entities import EntityCache
+from albums import AlbumBuffer
+from send_queue import SendQueue
+from media import MediaCache
+from notifications import ChangeListener, publish_change
+import metrics
+import channel_catalog
+import migrate
+import queries
+import outbox
+from catchup import CatchUp
+import backfill
+import log_retention
 
 # Configure logging
 logging.basicConfig(
@@ -23,30 +44,71 @@ logging.getLogger('asyncio').setLevel(logging.WARNING)
 
 
 # Global variables for multi-user support
-USER_SESSIONS = {}  # user_id: {client, source, destination, replacements}
-MESSAGE_IDS = {}    # user_id: {source_msg_id: destination_msg_id}
+USER_SESSIONS = {}  # user_id: {client, routes, replacements (ReplacementEngine), entities (EntityCache), media (MediaCache), outbox (OutboxSenders), backfills (job tasks)}
+
+# Seconds to wait before reconnecting a dropped session / for a new session to come up
+RECONNECT_DELAY = int(os.getenv('RECONNECT_DELAY', '30'))
+SESSION_START_TIMEOUT = int(os.getenv('SESSION_START_TIMEOUT', '60'))
+ENTITY_CACHE_TTL = int(os.getenv('ENTITY_CACHE_TTL', '3600'))
+ALBUM_WINDOW = float(os.getenv('ALBUM_WINDOW', '0.5'))
+SEND_RATE_PER_ACCOUNT = float(os.getenv('SEND_RATE_PER_ACCOUNT', '5'))
+SEND_RATE_PER_DESTINATION = float(os.getenv('SEND_RATE_PER_DESTINATION', '1'))
+
+# Single event loop hosting every user's session
+supervisor = ForwardingSupervisor()
+
+# With FORWARDING_MODE=workers, sessions are owned by `python main.py --workers N`
+# processes; otherwise the web process runs an embedded worker
+WORKER_MODE = os.getenv('FORWARDING_MODE', 'inprocess') == 'workers'
+WORKER_HEARTBEAT_INTERVAL = int(os.getenv('WORKER_HEARTBEAT_INTERVAL', '10'))
+WORKER_RESYNC_INTERVAL = int(os.getenv('WORKER_RESYNC_INTERVAL', '300'))
+# Notifications that resync every session instead of just the changed user's
+FULL_RESYNC_EVENTS = ('resync', 'workers')
+WORKER_LEASE_TIMEOUT = int(os.getenv('WORKER_LEASE_TIMEOUT', '30'))
+LOG_MAINTENANCE_INTERVAL = int(os.getenv('LOG_MAINTENANCE_INTERVAL', '3600'))
+
+# Received messages go through the forwarding_outbox table; each session runs
+# OUTBOX_SENDERS sender tasks, each owning a share of the destinations
+OUTBOX_SENDERS = int(os.getenv('OUTBOX_SENDERS', '2'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '3'))
+
+# On every (re)connect, messages posted while the session was down are replayed
+CATCHUP_ENABLED = os.getenv('CATCHUP_ENABLED', 'true').lower() == 'true'
+CATCHUP_PAGE_SIZE = int(os.getenv('CATCHUP_PAGE_SIZE', '100'))
+CATCHUP_LIMIT = int(os.getenv('CATCHUP_LIMIT', '5000'))
+BACKFILL_PAGE_SIZE = int(os.getenv('BACKFILL_PAGE_SIZE', '500'))
+CHANNEL_UPDATE_DEBOUNCE = float(os.getenv('CHANNEL_UPDATE_DEBOUNCE', '5'))
+
+# Forwarding workers serve Prometheus metrics on this port (0 turns it off); with
+# --workers N, worker i uses METRICS_PORT + i
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Interface the worker's metrics server binds; only this machine by default
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# Messages received later than this after being posted are replays, not live traffic
+LIVE_MESSAGE_AGE = 300
+
+metrics.ACTIVE_SESSIONS.set_function(lambda: len(USER_SESSIONS))
+metrics.SEND_QUEUE_DEPTH.set_function(lambda: {
+    (user_id,): session['send_queue'].depth()
+    for user_id, session in list(USER_SESSIONS.items()) if 'send_queue' in session
+})
 
 # API credentials
 API_ID = int(os.getenv('API_ID', '27202142'))
 API_HASH = os.getenv('API_HASH', 'db4dd0d95dc68d46b77518bf997ed165')
 
 
-# Database connection 
-def get_db():
-    """Get database connection from pool"""
-    try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        logger.error(f"❌ Database connection error: {str(e)}")
-        return None
-
-def release_db(conn):
-    """Release connection back to pool"""
-    if conn:
-        conn.close()
-
+def format_channel_id(channel):
+    """Normalize a channel ID to its -100 prefixed string form"""
+    channel = str(channel)
+    if not channel.startswith('-100'):
+        channel = f"-100{channel.lstrip('-')}"
+    return channel
 
 async def setup_client(user_id, session_string, max_retries=3, retry_delay=5):
     """Initialize Telegram client for a specific user"""
@@ -86,96 +148,50 @@ async def setup_client(user_id, session_string, max_retries=3, retry_delay=5):
 
     return None
 
-def load_user_config(user_id):
-    """Load channel configuration for a specific user"""
-    conn = None
+def _query_user_replacements(conn, user_id):
+    """Fetch and compile active text replacements for a telegram_id on the given connection"""
+    with conn.cursor(cursor_factory=DictCursor) as cur:
+        # Convert telegram_id to integer for query
+        telegram_id = int(user_id) if isinstance(user_id, str) else user_id
+
+        cur.execute("""
+            SELECT t.original_text, t.replacement_text
+            FROM text_replacements t
+            JOIN users u ON u.id = t.user_id
+            WHERE u.telegram_id = %s AND t.is_active = true
+            ORDER BY LENGTH(original_text) DESC
+        """, (telegram_id,))
+
+        replacements = {}
+        for row in cur.fetchall():
+            replacements[row['original_text']] = row['replacement_text']
+            logger.debug(f"Loaded active replacement: '{row['original_text']}' → '{row['replacement_text']}'")
+
+        logger.info(f"✅ Loaded {len(replacements)} active replacements for telegram_id {telegram_id}")
+        return ReplacementEngine(replacements)
+
+async def load_user_replacements_async(user_id):
+    """Load text replacements for a specific user without blocking the event loop"""
     try:
-        conn = get_db()
-        if not conn:
-            return None, None
-
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            cur.execute("""
-                SELECT source_channel, destination_channel 
-                FROM channel_config 
-                WHERE user_id = %s
-                ORDER BY updated_at DESC 
-                LIMIT 1
-            """, (user_id,))
-            result = cur.fetchone()
-
-            if result:
-                return result['source_channel'], result['destination_channel']
-            else:
-                logger.warning(f"❌ No channel configuration found for user {user_id}")
-                return None, None
-
-    except Exception as e:
-        logger.error(f"❌ Channel config error for user {user_id}: {str(e)}")
-        return None, None
-    finally:
-        if conn:
-            release_db(conn)
-
-def load_user_replacements(user_id):
-    """Load text replacements for a specific user"""
-    conn = None
-    try:
-        conn = get_db()
-        if not conn:
-            return {}
-
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            # Convert telegram_id to integer for query
-            telegram_id = int(user_id) if isinstance(user_id, str) else user_id
-
-            cur.execute("""
-                SELECT t.original_text, t.replacement_text
-                FROM text_replacements t
-                JOIN users u ON u.id = t.user_id
-                WHERE u.telegram_id = %s AND t.is_active = true
-                ORDER BY LENGTH(original_text) DESC
-            """, (telegram_id,))
-
-            replacements = {}
-            for row in cur.fetchall():
-                replacements[row['original_text']] = row['replacement_text']
-                logger.info(f"✅ Loaded active replacement: '{row['original_text']}' → '{row['replacement_text']}'")
-
-            logger.info(f"✅ Loaded {len(replacements)} active replacements for telegram_id {telegram_id}")
-            return replacements
-
+        return await get_pool().run(_query_user_replacements, user_id)
     except Exception as e:
         logger.error(f"❌ Failed to load replacements for user {user_id}: {str(e)}")
-        return {}
-    finally:
-        if conn:
-            release_db(conn)
+        return ReplacementEngine()
 
 def apply_text_replacements(text, user_id):
     """Apply text replacements for a specific user"""
     if not text or user_id not in USER_SESSIONS:
         return text
 
-    result = text
-    replacements = USER_SESSIONS[user_id].get('replacements', {})
-    logger.info(f"Processing text: '{text}' with {len(replacements)} replacements")
-
-    # Sort replacements by length (longest first) to avoid partial replacements
-    sorted_replacements = sorted(
-        replacements.items(),
-        key=lambda x: len(x[0]),
-        reverse=True
-    )
-
-    # Apply each replacement
-    for original, replacement in sorted_replacements:
-        if original in result:
-            result = result.replace(original, replacement)
-            logger.info(f"✅ Applied replacement: '{original}' → '{replacement}'")
+    engine = USER_SESSIONS[user_id].get('replacements')
+    if not engine:
+        return text
 
+    started = time.perf_counter()
+    result = engine.apply(text)
+    metrics.REPLACEMENT_SECONDS.observe(time.perf_counter() - started)
     if result != text:
-        logger.info(f"Text after replacements: '{result}'")
+        logger.debug(f"Applied replacements for user {user_id}: '{text}' → '{result}'")
 
     return result
 
@@ -186,288 +202,753 @@ async def setup_user_handlers(user_id, client):
 
     try:
         session = USER_SESSIONS.get(user_id, {})
-        source = session.get('source')
-        destination = session.get('destination')
-
-        async def handle_new_message(event):
-            try:
-                # Format channel IDs for comparison
-                chat_id = str(event.chat_id)
-                if not chat_id.startswith('-100'):
-                    chat_id = f"-100{chat_id.lstrip('-')}"
+        routes = session.get('routes')
+        if not routes:
+            logger.error(f"❌ No channels configured for user {user_id}")
+            return False
 
-                source_id = str(source)
-                if not source_id.startswith('-100'):
-                    source_id = f"-100{source_id.lstrip('-')}"
+        # Every source fans out to its destinations; channel IDs are normalized once
+        fanout = {}
+        for source, destination in routes:
+            fanout.setdefault(format_channel_id(source), []).append(format_channel_id(destination))
+        source_chats = [int(source_id) for source_id in fanout]
+        destinations = sorted({dest_id for dest_ids in fanout.values() for dest_id in dest_ids})
+
+        # Resolve the destinations once; handlers reuse the cached peers
+        entities = session.setdefault('entities', EntityCache(client, ttl=ENTITY_CACHE_TTL))
+        await entities.preload(destinations)
+
+        # Sends and edits go through the account's rate-limited queue, in order per destination
+        send_queue = session.setdefault('send_queue', SendQueue(
+            account_rate=SEND_RATE_PER_ACCOUNT,
+            destination_rate=SEND_RATE_PER_DESTINATION,
+            name=str(user_id)
+        ))
+
+        # Source media is re-sent by reference, resolved once per file for all destinations
+        media = session.setdefault('media', MediaCache(client))
+
+        def send_to_destination(dest_id, request):
+            return send_queue.submit(dest_id, lambda: entities.call(dest_id, request))
+
+        async def fan_out(source_id, description, send, dest_ids=None):
+            """Run send(dest_id) for every destination of a source (or the given ones) concurrently.
+
+            A failing destination is logged and counted without affecting the others.
+            """
+            if dest_ids is None:
+                dest_ids = fanout.get(source_id, [])
+            results = await asyncio.gather(*[send(dest_id) for dest_id in dest_ids], return_exceptions=True)
+            for dest_id, result in zip(dest_ids, results):
+                if isinstance(result, Exception):
+                    metrics.FORWARD_FAILURES.inc(user=user_id)
+                    logger.error(f"❌ {description} to {dest_id} failed: {str(result)}")
+            return [dest_id for dest_id, result in zip(dest_ids, results) if not isinstance(result, Exception)]
+
+        async def record_forward(message, source_id, dest_id, sent_message, message_text, forward_start, forward_end,
+                                 timings):
+            # Store message mapping
+            get_message_map().put(user_id, source_id, message.id, dest_id, sent_message.id)
+
+            # Queue forwarding log for the batched database writer
+            await get_log_sink().submit({
+                'user_id': user_id,
+                'source_message_id': message.id,
+                'dest_message_id': sent_message.id,
+                'source_chat_id': source_id,
+                'dest_chat_id': dest_id,
+                'message_text': message_text,
+                'received_at': forward_start,
+                'forwarded_at': forward_end,
+                **timings,
+                'created_at': time.time()
+            })
+
+        async def send_forward(dest_id, source_id, messages, texts, received_at_ms, transform_ms):
+            """Send a message, or an album when given several, to one destination and record it"""
+            stamps = {}
+
+            def timed(request):
+                # The last attempt's start: waits and retries before it count as queueing
+                async def send(peer):
+                    stamps['send_start'] = time.time()
+                    return await request(peer)
+                return send
+
+            if len(messages) > 1:
+                sent_messages = await media.send_album(messages, lambda files: send_to_destination(
+                    dest_id, timed(lambda peer: client.send_file(peer, files, caption=texts))
+                ))
+            else:
+                sent_messages = [await media.send(messages[0], lambda file: send_to_destination(
+                    dest_id, timed(lambda peer: client.send_message(
+                        peer,
+                        texts[0],
+                        file=file,
+                        formatting_entities=messages[0].entities
+                    ))
+                ))]
+
+            sent_at = time.time()
+            received_at = received_at_ms / 1000
+            transformed_at = received_at + (transform_ms or 0) / 1000
+            send_start = stamps.get('send_start', transformed_at)
+            metrics.MESSAGES_FORWARDED.inc(len(sent_messages), user=user_id)
+            for message, sent_message, text in zip(messages, sent_messages, texts):
+                posted_at = message.date.timestamp()
+                # Only live messages: replayed and backfilled history would swamp the distribution
+                live = received_at - posted_at < LIVE_MESSAGE_AGE
+                if live:
+                    metrics.END_TO_END_SECONDS.observe(sent_at - posted_at)
+                timings = {
+                    'receive_ms': round((received_at - posted_at) * 1000) if live else None,
+                    'transform_ms': transform_ms,
+                    'queue_ms': round((send_start - transformed_at) * 1000),
+                    'send_ms': round((sent_at - send_start) * 1000),
+                    'total_ms': round((sent_at - posted_at) * 1000) if live else None
+                }
+                await record_forward(message, source_id, dest_id, sent_message, text,
+                                     int(received_at), int(sent_at), timings)
+            return [sent_message.id for sent_message in sent_messages]
+
+        async def deliver(entry):
+            """Send an outbox entry claimed by one of the session's senders"""
+            messages = outbox.load_messages(client, entry['messages'])
+            return await send_forward(
+                format_channel_id(entry['dest_chat_id']),
+                format_channel_id(entry['source_chat_id']),
+                messages,
+                entry['texts'],
+                # Entries queued before latency tracking only have whole seconds
+                entry['received_at_ms'] or entry['received_at'] * 1000,
+                entry['transform_ms']
+            )
 
-                # Compare exact channel IDs
-                if chat_id != source_id:
-                    return
+        session['deliver'] = deliver
+
+        def outbox_entries(messages, dest_ids=None, received_at=None, priority=outbox.LIVE):
+            """Outbox rows sending a message or album to the given destinations (default: its routes)"""
+            source_id = format_channel_id(messages[0].chat_id)
+            if dest_ids is None:
+                dest_ids = fanout.get(source_id, [])
+            if received_at is None:
+                received_at = time.time()
+
+            # Transform once, then send the same result to every destination
+            started = time.perf_counter()
+            texts = [apply_text_replacements(m.text or "", user_id) for m in messages]
+            payload = outbox.serialize_messages(messages)
+            transform_ms = round((time.perf_counter() - started) * 1000)
+            return [{
+                'user_id': user_id,
+                'source_chat_id': int(source_id),
+                'source_message_id': messages[0].id,
+                'dest_chat_id': int(dest_id),
+                'messages': payload,
+                'texts': texts,
+                'received_at': int(received_at),
+                'received_at_ms': int(received_at * 1000),
+                'transform_ms': transform_ms,
+                'priority': priority
+            } for dest_id in dest_ids]
+
+        session['outbox_entries'] = outbox_entries
+
+        async def forward(messages, received_at=None):
+            """Queue a message or album for every destination of its source in the outbox"""
+            metrics.MESSAGES_RECEIVED.inc(len(messages), user=user_id)
+            entries = outbox_entries(messages, received_at=received_at)
+            try:
+                queued = await get_pool().run(outbox.enqueue, entries)
+            except Exception as e:
+                # Without the outbox, still forward: just not durably
+                logger.error(f"❌ Outbox write failed, sending message {messages[0].id} directly: {str(e)}")
 
-                # Process message
-                message = event.message
-                message_text = message.text if message.text else ""
-                if message_text:
-                    message_text = apply_text_replacements(message_text, user_id)
+                source_id = format_channel_id(messages[0].chat_id)
 
-                try:
-                    # Format destination ID
-                    dest_id = str(destination)
-                    if not dest_id.startswith('-100'):
-                        dest_id = f"-100{dest_id.lstrip('-')}"
+                async def send_directly(dest_id):
+                    try:
+                        await send_forward(dest_id, source_id, messages, entries[0]['texts'],
+                                           entries[0]['received_at_ms'], entries[0]['transform_ms'])
+                    except Exception:
+                        get_log_sink().record_failure(user_id, len(messages))
+                        raise
 
-                    # Forward message
-                    dest_channel = await client.get_entity(int(dest_id))
-                    logger.info(f"📥 Forwarding message to destination channel")
+                sent = await fan_out(source_id, "Message forward", send_directly)
+                logger.info(f"✅ Message forwarded to {len(sent)} destinations")
+                return
 
-                    forward_start = int(time.time())
+            if queued:
+                logger.info(f"📥 Queued {len(messages)} message(s) for {queued} destinations")
+                wake_outbox_senders(session)
 
-                    sent_message = await client.send_message(
-                        dest_channel,
-                        message_text,
-                        file=message.media if message.media else None,
-                        formatting_entities=message.entities
-                    )
+        albums = session['albums'] = AlbumBuffer(forward, window=ALBUM_WINDOW)
 
-                    forward_end = int(time.time())
+        async def handle_new_message(event):
+            received_at = time.time()
+            try:
+                # Process message
+                message = event.message
 
-                    # Store message mapping
-                    if user_id not in MESSAGE_IDS:
-                        MESSAGE_IDS[user_id] = {}
-                    MESSAGE_IDS[user_id][message.id] = sent_message.id
+                # Album items are collected and sent together
+                if message.grouped_id:
+                    albums.add(message)
+                    return
 
-                    # Store forwarding logs in database
-                    conn = get_db()
-                    if conn:
-                        try:
-                            with conn.cursor() as cur:
-                                cur.execute("""
-                                    INSERT INTO forwarding_logs 
-                                    (user_id, source_message_id, dest_message_id, source_chat_id, 
-                                     dest_chat_id, message_text, received_at, forwarded_at, created_at)
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-                                """, (
-                                    user_id, message.id, sent_message.id, 
-                                    source_id, dest_id, message_text,
-                                    forward_start, forward_end
-                                ))
-                            logger.info("✅ Message forwarded successfully")
-                        except Exception as db_error:
-                            logger.error(f"❌ Database error: {str(db_error)}")
-                        finally:
-                            release_db(conn)
-
-                except Exception as e:
-                    logger.error(f"❌ Message forward error: {str(e)}")
+                await forward([message], received_at)
 
             except Exception as e:
                 logger.error(f"❌ Handler error: {str(e)}")
 
         async def handle_edit(event):
             try:
-                # Format channel IDs for comparison
-                chat_id = str(event.chat_id)
-                if not chat_id.startswith('-100'):
-                    chat_id = f"-100{chat_id.lstrip('-')}"
-
-                source_id = str(source)
-                if not source_id.startswith('-100'):
-                    source_id = f"-100{source_id.lstrip('-')}"
-
-                # Compare exact channel IDs
-                if chat_id != source_id:
-                    return
-
                 # Get message mapping
                 edited_msg = event.message
-                message_mapping = MESSAGE_IDS.get(user_id, {})
-                dest_msg_id = message_mapping.get(edited_msg.id)
+                source_id = format_channel_id(event.chat_id)
+                dest_msg_ids = await get_message_map().get(
+                    user_id, source_id, edited_msg.id, expected=fanout.get(source_id, [])
+                )
 
-                if not dest_msg_id:
+                if not dest_msg_ids:
                     logger.warning(f"❌ No mapping found for edited message {edited_msg.id}")
                     return
 
-                # Get destination channel
-                dest_id = str(destination)
-                if not dest_id.startswith('-100'):
-                    dest_id = f"-100{dest_id.lstrip('-')}"
-
                 # Apply text replacements if message has text
                 message_text = edited_msg.text if edited_msg.text else ""
                 if message_text:
                     message_text = apply_text_replacements(message_text, user_id)
 
-                # Edit message in destination channel
-                dest_channel = await client.get_entity(int(dest_id))
-                await client.edit_message(
-                    dest_channel,
-                    dest_msg_id,
-                    message_text,
-                    file=edited_msg.media if edited_msg.media else None,
-                    formatting_entities=edited_msg.entities
-                )
-                logger.info(f"✅ Message {edited_msg.id} edited in destination channel")
+                async def edit_message(dest_id):
+                    dest_msg_id = dest_msg_ids.get(dest_id)
+                    if not dest_msg_id:
+                        return
+
+                    # Text-only edits leave the destination's media untouched
+                    media_changed = await media.media_changed(
+                        edited_msg,
+                        lambda: entities.call(dest_id, lambda peer: client.get_messages(peer, ids=dest_msg_id))
+                    )
+
+                    def edit(file):
+                        return send_to_destination(dest_id, lambda peer: client.edit_message(
+                            peer,
+                            dest_msg_id,
+                            message_text,
+                            file=file,
+                            formatting_entities=edited_msg.entities
+                        ))
+
+                    # Edit message in destination channel
+                    if media_changed:
+                        await media.send(edited_msg, edit)
+                    else:
+                        await edit(None)
+
+                # Every destination the message reached, including backfilled ones that aren't live routes
+                edited = await fan_out(source_id, "Message edit", edit_message, list(dest_msg_ids))
+                metrics.MESSAGES_EDITED.inc(len(edited), user=user_id)
+                logger.info(f"✅ Message {edited_msg.id} edited in {len(dest_msg_ids)} destinations")
 
             except Exception as e:
                 logger.error(f"❌ Message edit error: {str(e)}")
 
-        # Setup handlers for new messages and edits
-        client.add_event_handler(handle_new_message, events.NewMessage())
-        client.add_event_handler(handle_edit, events.MessageEdited())
+        channel_updates = session.setdefault(
+            'channel_updates',
+            channel_catalog.ChannelUpdates(client, get_pool(), user_id, delay=CHANNEL_UPDATE_DEBOUNCE)
+        )
+
+        async def handle_channel_update(update):
+            """Keep the account's channel catalogue in step with joins, leaves and renames"""
+            try:
+                await channel_updates.handle(update)
+            except Exception as e:
+                logger.error(f"❌ Channel catalogue update error: {str(e)}")
+
+        # Edits are synced for the live sources and for every source backfilled from
+        try:
+            backfilled = await get_pool().run(backfill.job_sources, user_id)
+        except Exception as e:
+            logger.error(f"❌ Backfill sources lookup error for user {user_id}: {str(e)}")
+            backfilled = []
+        edit_sources = session['edit_sources'] = set(source_chats) | {
+            int(format_channel_id(source)) for source in backfilled
+        }
+
+        # Setup handlers for new messages in the source channels and edits in the edit sources
+        remove_user_handlers(user_id, client)
+        handlers = [
+            (handle_new_message, events.NewMessage(chats=source_chats)),
+            (handle_edit, events.MessageEdited(func=lambda event: event.chat_id in edit_sources)),
+            (handle_channel_update, events.Raw(types.UpdateChannel))
+        ]
+        for callback, event in handlers:
+            client.add_event_handler(callback, event)
+        session['handlers'] = handlers
         return True
 
     except Exception as e:
         logger.error(f"❌ Handler setup error: {str(e)}")
         return False
 
-async def manage_user_session(user_id):
-    """Manage a user's bot session"""
-    while True:
-        try:
-            # Check if bot should still be running
-            conn = get_db()
-            if conn:
-                try:
-                    with conn.cursor(cursor_factory=DictCursor) as cur:
-                        cur.execute("""
-                            SELECT is_running, session_string 
-                            FROM bot_status 
-                            WHERE user_id = %s
-                        """, (user_id,))
-                        result = cur.fetchone()
-
-                        if not result or not result['is_running']:
-                            logger.info(f"👋 Bot stopped for user {user_id}")
-                            break
-
-                        # Update session if client is not connected
-                        if user_id in USER_SESSIONS:
-                            client = USER_SESSIONS[user_id].get('client')
-                            if not client or not client.is_connected():
-                                logger.error(f"❌ Client disconnected for user {user_id}, reconnecting...")
-                                client = await setup_client(user_id, result['session_string'])
-                                if client:
-                                    # Get latest channel config
-                                    cur.execute("""
-                                        SELECT source_channel, destination_channel
-                                        FROM channel_config
-                                        WHERE user_id = %s
-                                    """, (user_id,))
-                                    channels = cur.fetchone()
-
-                                    if channels:
-                                        USER_SESSIONS[user_id] = {
-                                            'client': client,
-                                            'source': channels['source_channel'],
-                                            'destination': channels['destination_channel'],
-                                            'replacements': load_user_replacements(user_id)
-                                        }
-                                        success = await setup_user_handlers(user_id, client)
-                                        if success:
-                                            logger.info(f"✅ Successfully reconnected bot for user {user_id}")
-                                        else:
-                                            logger.error(f"❌ Failed to setup handlers for user {user_id}")
-                finally:
-                    release_db(conn)
-
-            # Wait before next check
-            await asyncio.sleep(30)
+def remove_user_handlers(user_id, client):
+    """Detach the message handlers previously registered for a user"""
+    session = USER_SESSIONS.get(user_id, {})
+    for callback, event in session.pop('handlers', []):
+        client.remove_event_handler(callback, event)
 
-        except Exception as e:
-            logger.error(f"❌ Session management error for user {user_id}: {str(e)}")
-            await asyncio.sleep(30)
+async def reload_user_routes(user_id, routes):
+    """Switch a running session to new routes and rebuild its handlers"""
+    session = USER_SESSIONS.get(user_id)
+    if not session:
+        return False
+    session['routes'] = routes
+    if not await setup_user_handlers(user_id, session['client']):
+        return False
+    logger.info(f"✅ Routes updated for user {user_id}")
+    return True
 
-def add_user_session(user_id, session_string, source_channel=None, destination_channel=None):
-    """Add or update a user's session"""
-    async def setup_session():
-        try:
+def wake_outbox_senders(session):
+    """Have a session's outbox senders claim newly queued entries right away"""
+    for sender in session.get('outbox', []):
+        sender.wake()
+
+async def start_outbox_senders(user_id):
+    """Start the session's outbox senders, first re-queueing whatever a previous run left half-sent"""
+    session = USER_SESSIONS[user_id]
+    try:
+        recovered = await get_pool().run(outbox.recover, user_id)
+        if recovered:
+            logger.warning(f"⚠️ Re-queued {recovered} unfinished forwards for user {user_id}")
+    except Exception as e:
+        logger.error(f"❌ Outbox recovery error for user {user_id}: {str(e)}")
+
+    # Handlers may be rebuilt while the senders run, so look deliver() up on every entry
+    async def deliver(entry):
+        return await session['deliver'](entry)
+
+    session['outbox'] = [
+        outbox.OutboxSender(
+            get_pool(), user_id, deliver,
+            shard=shard,
+            shards=OUTBOX_SENDERS,
+            batch_size=OUTBOX_BATCH_SIZE,
+            poll_interval=OUTBOX_POLL_INTERVAL,
+            max_attempts=OUTBOX_MAX_ATTEMPTS
+        )
+        for shard in range(OUTBOX_SENDERS)
+    ]
+    loop = asyncio.get_running_loop()
+    return [loop.create_task(sender.run()) for sender in session['outbox']]
+
+async def catch_up(user_id):
+    """Queue what the session's sources posted while it was down, alongside live traffic"""
+    session = USER_SESSIONS[user_id]
+    replay = CatchUp(
+        session['client'], session['entities'], get_pool(), user_id,
+        lambda messages: session['outbox_entries'](messages, priority=outbox.BACKLOG),
+        lambda: wake_outbox_senders(session),
+        page_size=CATCHUP_PAGE_SIZE,
+        limit=CATCHUP_LIMIT
+    )
+    sources = sorted({format_channel_id(source) for source, _ in session['routes']})
+    queued = await replay.run(sources)
+    if queued:
+        logger.info(f"✅ Caught up {queued} missed messages for user {user_id}")
+
+async def run_user_session(user_id, session_string, routes, ready):
+    """Run a user's forwarding session on the supervisor loop, reconnecting until stopped"""
+    client = None
+    try:
+        while True:
             client = await setup_client(user_id, session_string)
             if client:
                 # Initialize or update user session
                 USER_SESSIONS[user_id] = {
                     'client': client,
-                    'source': source_channel,
-                    'destination': destination_channel,
-                    'replacements': load_user_replacements(user_id)
+                    'routes': routes,
+                    'replacements': await load_user_replacements_async(user_id)
                 }
 
-                # Setup handlers and start client
-                success = await setup_user_handlers(user_id, client)
-                if success:
+                if await setup_user_handlers(user_id, client):
+                    tasks = await start_outbox_senders(user_id)
+                    if CATCHUP_ENABLED:
+                        tasks.append(asyncio.get_running_loop().create_task(catch_up(user_id)))
+                    if not ready.done():
+                        ready.set_result(True)
+                    logger.info(f"✅ Forwarding session running for user {user_id}")
                     try:
                         await client.run_until_disconnected()
-                        return True
-                    except Exception as e:
-                        logger.error(f"❌ Client run error: {str(e)}")
-                        return False
-            return False
-        except Exception as e:
-            logger.error(f"❌ Session setup error: {str(e)}")
-            return False
+                    finally:
+                        for task in tasks + list(USER_SESSIONS[user_id].get('backfills', {}).values()):
+                            task.cancel()
+                        USER_SESSIONS[user_id]['channel_updates'].close()
+                    logger.error(f"❌ Client disconnected for user {user_id}, reconnecting...")
+                else:
+                    logger.error(f"❌ Failed to setup handlers for user {user_id}")
+                    await client.disconnect()
+
+                # Keep any route changes made while the session was running
+                routes = USER_SESSIONS.get(user_id, {}).get('routes', routes)
+
+            if not ready.done():
+                ready.set_result(False)
+                return
+            await asyncio.sleep(RECONNECT_DELAY)
+    finally:
+        session = USER_SESSIONS.pop(user_id, None)
+        if session and session.get('albums') and client and client.is_connected():
+            await session['albums'].close()
+        if session and session.get('send_queue'):
+            await session['send_queue'].close()
+        if client and client.is_connected():
+            try:
+                await client.disconnect()
+                logger.info(f"✅ Client disconnected for user {user_id}")
+            except Exception as e:
+                logger.error(f"❌ Client disconnect error: {str(e)}")
 
+async def start_user_session(user_id, session_string, routes=()):
+    """Start (or restart) a user's session on the supervisor loop and wait until it is live"""
+    await supervisor.cancel(user_id)
+    ready = asyncio.get_running_loop().create_future()
+    task = supervisor.spawn(user_id, run_user_session(user_id, session_string, routes, ready))
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(setup_session())
+        return await asyncio.wait_for(asyncio.shield(ready), timeout=SESSION_START_TIMEOUT)
     except Exception as e:
-        logger.error(f"❌ Add session error: {str(e)}")
+        logger.error(f"❌ Session setup error: {str(e)}")
+        task.cancel()
         return False
 
-def remove_user_session(user_id):
-    """Remove a user's session"""
-    if user_id in USER_SESSIONS:
-        try:
-            session = USER_SESSIONS[user_id]
-            client = session.get('client')
-            if client:
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(client.disconnect())
-                    loop.close()
-                    logger.info(f"✅ Client disconnected for user {user_id}")
-                except Exception as e:
-                    logger.error(f"❌ Client disconnect error: {str(e)}")
-
-            USER_SESSIONS.pop(user_id)
-            if user_id in MESSAGE_IDS:
-                MESSAGE_IDS.pop(user_id)
-            logger.info(f"✅ Session removed for user {user_id}")
-            return True
-        except Exception as e:
-            logger.error(f"❌ Session removal error for user {user_id}: {str(e)}")
+async def stop_user_session(user_id):
+    """Stop a user's session on the supervisor loop"""
+    if await supervisor.cancel(user_id):
+        logger.info(f"✅ Session removed for user {user_id}")
+        return True
     return False
 
-def update_user_channels(user_id, source, destination):
-    """Update a user's channel configuration"""
-    if user_id in USER_SESSIONS:
-        USER_SESSIONS[user_id].update({
-            'source': source,
-            'destination': destination
-        })
-        logger.info(f"✅ Channels updated for user {user_id}")
-
-def update_user_replacements(user_id):
-    """Update a user's text replacements"""
-    if user_id in USER_SESSIONS:
-        logger.info(f"Updating replacements for user {user_id}")
-        replacements = load_user_replacements(user_id)
-        USER_SESSIONS[user_id]['replacements'] = replacements
-        logger.info(f"✅ Updated {len(replacements)} replacements for user {user_id}")
+async def load_active_sessions(user_id=None):
+    """Load every account whose forwarding is switched on with all of its routes, or only one dashboard user's"""
+    rows = await get_pool().fetchall(f"""
+        SELECT ta.telegram_id, ta.session_string, r.source_channel, r.destination_channel
+        FROM forwarding_configs fc
+        JOIN telegram_accounts ta
+          ON ta.user_id = fc.user_id AND ta.is_primary = true AND ta.is_active = true
+        JOIN LATERAL (
+            SELECT fc.source_channel, fc.destination_channel
+            UNION
+            SELECT fr.source_channel, fr.destination_channel
+            FROM forwarding_routes fr
+            WHERE fr.user_id = fc.user_id
+        ) r ON r.source_channel IS NOT NULL AND r.destination_channel IS NOT NULL
+        WHERE fc.is_active = true{' AND fc.user_id = %s' if user_id is not None else ''}
+    """, (user_id,) if user_id is not None else None)
+    sessions = {}
+    for row in rows:
+        session_string, routes = sessions.setdefault(int(row['telegram_id']), (row['session_string'], set()))
+        routes.add((format_channel_id(row['source_channel']), format_channel_id(row['destination_channel'])))
+    # Sorted tuples so a worker can tell whether a session's routes changed
+    return {
+        telegram_id: (session_string, tuple(sorted(routes)))
+        for telegram_id, (session_string, routes) in sessions.items()
+    }
+
+async def load_user_accounts(user_id):
+    """Telegram IDs of every account a dashboard user has connected"""
+    rows = await get_pool().fetchall(queries.USER_ACCOUNTS_QUERY, (user_id,))
+    return {int(row['telegram_id']) for row in rows}
+
+async def removed_accounts(telegram_ids):
+    """Which of these Telegram accounts have been deleted from the dashboard"""
+    if not telegram_ids:
+        return set()
+    rows = await get_pool().fetchall(queries.EXISTING_ACCOUNTS_QUERY, (list(telegram_ids),))
+    return set(telegram_ids) - {int(row['telegram_id']) for row in rows}
+
+def _query_replacements_for(conn, telegram_ids):
+    """Fetch active text replacements for several telegram_ids in one query"""
+    with conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(queries.ACCOUNT_REPLACEMENTS_QUERY, (list(telegram_ids),))
+        replacements = {telegram_id: {} for telegram_id in telegram_ids}
+        for row in cur.fetchall():
+            replacements[int(row['telegram_id'])][row['original_text']] = row['replacement_text']
+        return replacements
+
+async def reload_replacements(telegram_ids):
+    """Pick up replacement changes for several running sessions in one query"""
+    if not telegram_ids:
+        return
+    replacements = await get_pool().run(_query_replacements_for, list(telegram_ids))
+    for telegram_id, rules in replacements.items():
+        session = USER_SESSIONS.get(telegram_id)
+        if session and session['replacements'].rules != rules:
+            session['replacements'] = ReplacementEngine(rules)
+            logger.info(f"✅ Updated {len(rules)} replacements for user {telegram_id}")
+
+async def reconcile_sessions(coordinator, running, workers, user_id=None):
+    """Bring this worker's sessions in line with the hash ring and the database.
+
+    With a user_id, only that dashboard user's accounts are looked at.
+    """
+    ring = HashRing(workers)
+    desired = await load_active_sessions(user_id)
+    owned = await coordinator.owned_sessions()
+    worker_id = coordinator.worker_id
+    scope = None
+    if user_id is not None:
+        # A session whose account was just deleted no longer belongs to anyone
+        scope = await load_user_accounts(user_id) | await removed_accounts(list(running))
+
+    def in_scope(telegram_id):
+        return scope is None or telegram_id in scope
+
+    # Stop sessions that moved to another worker, were switched off or got a new session
+    for telegram_id in [telegram_id for telegram_id in running if in_scope(telegram_id)]:
+        config = desired.get(telegram_id)
+        assigned = ring.get(telegram_id) == worker_id and telegram_id in owned
+        if config and assigned and running[telegram_id] != config:
+            # Same account with new routes only needs its handlers rebuilt
+            if running[telegram_id][0] == config[0] and await reload_user_routes(telegram_id, config[1]):
+                running[telegram_id] = config
+                continue
+        if not config or not assigned or running[telegram_id] != config:
+            await stop_user_session(telegram_id)
+            running.pop(telegram_id)
+            if not config or not assigned:
+                await coordinator.release(telegram_id)
+
+    # Release ownership of sessions this worker no longer needs
+    for telegram_id in owned - set(running):
+        if in_scope(telegram_id) and telegram_id not in desired or ring.get(telegram_id) != worker_id:
+            await coordinator.release(telegram_id)
+
+    # Claim and start sessions assigned to this worker
+    to_start = []
+    for telegram_id, config in desired.items():
+        if telegram_id in running or ring.get(telegram_id) != worker_id:
+            continue
+        if await coordinator.claim(telegram_id):
+            to_start.append((telegram_id, config))
+
+    results = await asyncio.gather(*[
+        start_user_session(telegram_id, *config) for telegram_id, config in to_start
+    ])
+    for (telegram_id, config), started in zip(to_start, results):
+        if started:
+            running[telegram_id] = config
+        else:
+            await coordinator.release(telegram_id)
+
+    scoped = {telegram_id: config for telegram_id, config in running.items() if in_scope(telegram_id)}
+    await reload_replacements(scoped)
 
-if __name__ == "__main__":
     try:
-        # Keep the main thread running
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        await sync_backfill_jobs(scoped)
+    except Exception as e:
+        logger.error(f"❌ Backfill job sync error: {str(e)}")
+
+    if to_start:
+        logger.info(f"Worker {worker_id}: {len(running)} sessions running across {len(ring)} workers")
+
+async def apply_change(coordinator, running, workers, kind, user_id):
+    """Apply one dashboard user's change to this worker without resyncing every session"""
+    if kind == 'replacements':
+        await reload_replacements([telegram_id for telegram_id in await load_user_accounts(user_id)
+                                   if telegram_id in running])
+    elif kind == 'backfill':
+        accounts = await load_user_accounts(user_id)
+        await sync_backfill_jobs({telegram_id: running[telegram_id] for telegram_id in accounts
+                                  if telegram_id in running})
+    else:
+        await reconcile_sessions(coordinator, running, workers, user_id)
+
+async def sync_backfill_jobs(running):
+    """Run the pending backfill jobs of this worker's sessions and stop paused or cancelled ones"""
+    jobs = await get_pool().run(backfill.active_jobs, list(running)) if running else []
+    wanted = {job['id']: job for job in jobs}
+
+    for telegram_id in running:
+        session = USER_SESSIONS.get(telegram_id)
+        if not session:
+            continue
+        backfills = session.setdefault('backfills', {})
+        for job_id, task in list(backfills.items()):
+            if task.done() or job_id not in wanted:
+                task.cancel()
+                backfills.pop(job_id)
+
+    for job_id, job in wanted.items():
+        session = USER_SESSIONS.get(job['telegram_id'])
+        if not session or 'outbox_entries' not in session or job_id in session.setdefault('backfills', {}):
+            continue
+
+        # Edits of the copied posts are synced even if the source isn't a live route
+        session.setdefault('edit_sources', set()).add(int(format_channel_id(job['source_channel'])))
+        runner = backfill.BackfillRunner(
+            session['client'], session['entities'], get_pool(), job,
+            lambda messages, dest_ids, session=session: session['outbox_entries'](
+                messages, dest_ids, priority=outbox.BACKLOG
+            ),
+            lambda session=session: wake_outbox_senders(session),
+            page_size=BACKFILL_PAGE_SIZE
+        )
+        session['backfills'][job_id] = asyncio.get_running_loop().create_task(runner.run())
+
+async def maintain_logs_forever(db_pool):
+    """Keep forwarding_logs partitions created ahead of time, expire old ones and purge the outbox"""
+    while True:
+        try:
+            # Only one worker at a time gets the maintenance lock; the others skip this round
+            await db_pool.run(log_retention.maintain_from_env)
+        except Exception as e:
+            logger.error(f"❌ Log partition maintenance error: {str(e)}")
         try:
-            loop.run_forever()
-        except KeyboardInterrupt:
-            logger.info("👋 Bot stopped by user")
-        finally:
-            loop.close()
+            purged = await db_pool.run(outbox.purge, OUTBOX_RETENTION_DAYS)
+            if purged:
+                logger.info(f"✅ Purged {purged} finished outbox entries")
+        except Exception as e:
+            logger.error(f"❌ Outbox purge error: {str(e)}")
+        await asyncio.sleep(LOG_MAINTENANCE_INTERVAL)
+
+async def run_worker(worker_id):
+    """Run a forwarding worker that owns its share of sessions until cancelled"""
+    db_pool = get_pool()
+    coordinator = WorkerCoordinator(worker_id, db_pool, lease_timeout=WORKER_LEASE_TIMEOUT)
+    running = {}
+
+    # Config, replacement and status changes (and peers joining) wake the worker immediately
+    wake = asyncio.Event()
+    changes = set()
+
+    def on_change(event):
+        changes.add((event.get('type'), event.get('user_id')))
+        wake.set()
+
+    listener = ChangeListener(os.getenv('DATABASE_URL'), on_change)
+    listener_task = asyncio.get_running_loop().create_task(listener.run())
+    maintenance_task = asyncio.get_running_loop().create_task(maintain_logs_forever(db_pool))
+
+    workers = None
+    last_sync = 0.0
+    logger.info(f"✅ Forwarding worker {worker_id} started")
+    try:
+        await coordinator.heartbeat()
+        await publish_change(db_pool, 'workers', worker_id=worker_id)
+        while True:
+            try:
+                await coordinator.heartbeat()
+                live = await coordinator.live_workers()
+                wake.clear()
+                pending = list(changes)
+                changes.clear()
+                # Ring changes, reconnects, account changes and the timer resync everything
+                if (live != workers or time.monotonic() - last_sync >= WORKER_RESYNC_INTERVAL
+                        or any(kind in FULL_RESYNC_EVENTS or user_id is None for kind, user_id in pending)):
+                    await reconcile_sessions(coordinator, running, live)
+                    workers = live
+                    last_sync = time.monotonic()
+                else:
+                    for kind, user_id in pending:
+                        try:
+                            await apply_change(coordinator, running, live, kind, user_id)
+                        except Exception as e:
+                            logger.error(f"❌ Worker {worker_id} could not apply {kind} change "
+                                         f"for user {user_id}: {str(e)}")
+            except Exception as e:
+                logger.error(f"❌ Worker {worker_id} reconcile error: {str(e)}")
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=WORKER_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        listener_task.cancel()
+        maintenance_task.cancel()
+        for telegram_id in list(running):
+            await stop_user_session(telegram_id)
+        await coordinator.deregister()
+        await publish_change(db_pool, 'workers', worker_id=worker_id)
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve_metrics(port):
+    """Expose this process's metrics over HTTP, unless turned off or no METRICS_TOKEN is set"""
+    if not port:
+        return
+    if not METRICS_TOKEN:
+        logger.warning("⚠️ METRICS_TOKEN is not set, so metrics aren't served")
+        return
+    try:
+        metrics.serve(port, host=METRICS_HOST, token=METRICS_TOKEN)
+    except OSError as e:
+        logger.error(f"❌ Could not serve metrics on port {port}: {str(e)}")
+
+def worker_main(worker_id, metrics_port=METRICS_PORT):
+    """Process entry point for a single forwarding worker"""
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    serve_metrics(metrics_port)
+    supervisor.start()
+    supervisor.call(_spawn_worker(worker_id))
+    try:
+        while supervisor.get_task('worker'):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info(f"👋 Stopping worker {worker_id}")
+    finally:
+        supervisor.call(supervisor.cancel('worker'), timeout=WORKER_LEASE_TIMEOUT)
+        supervisor.stop()
+
+async def _spawn_worker(worker_id):
+    supervisor.spawn('worker', run_worker(worker_id))
+
+def start_embedded_worker():
+    """Run a forwarding worker on the supervisor loop of the current (web) process"""
+    if supervisor.get_task('worker'):
+        return
+    worker_id = f"{socket.gethostname()}:web-{os.getpid()}"
+    supervisor.start()
+    supervisor.call(_spawn_worker(worker_id))
+    atexit.register(lambda: supervisor.call(supervisor.cancel('worker'), timeout=WORKER_LEASE_TIMEOUT))
+
+def run_workers(count):
+    """Run `count` forwarding worker processes and wait for them"""
+    host = socket.gethostname()
+    processes = [
+        multiprocessing.Process(
+            target=worker_main,
+            args=(f"{host}:{i}", METRICS_PORT + i if METRICS_PORT else 0),
+            name=f"forwarding-worker-{i}"
+        )
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("👋 Stopping forwarding workers")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telegram forwarding worker")
+    parser.add_argument('--workers', type=int, default=0, help="number of forwarding worker processes to run")
+    parser.add_argument('--worker-id', help="run a single forwarding worker with this ID")
+    args = parser.parse_args()
+
+    try:
+        migrate.migrate()
+        if args.workers:
+            run_workers(args.workers)
+        elif args.worker_id or WORKER_MODE:
+            worker_main(args.worker_id or f"{socket.gethostname()}:0")
+        else:
+            # Host forwarding sessions on the supervisor loop in the main thread
+            serve_metrics(METRICS_PORT)
+            supervisor.run_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Bot stopped by user")
     except Exception as e:
         logger.error(f"❌ Fatal error: {str(e)}")
-        if not USER_SESSIONS:
-            logger.warning("⚠️ No session string provided, waiting for configuration")
\ No newline at end of file
@@ -0,0 +1,157 @@
+import logging
+import asyncio
+from collections import OrderedDict
+from telethon import utils, types
+from telethon.errors import FileReferenceExpiredError, ChatForwardsRestrictedError
+
+logger = logging.getLogger(__name__)
+
+# Media that is rebuilt from the message text (link previews) or can't be re-sent as a file
+TEXT_ONLY_MEDIA = (types.MessageMediaWebPage, types.MessageMediaEmpty, types.MessageMediaUnsupported)
+
+
+def media_key(media):
+    """Stable identity of a message's photo or document, or None for other media"""
+    if isinstance(media, types.MessageMediaPhoto) and media.photo:
+        return ('photo', media.photo.id)
+    if isinstance(media, types.MessageMediaDocument) and media.document:
+        return ('document', media.document.id)
+    return None
+
+
+def input_media_key(input_media):
+    """media_key() of the photo or document an InputMedia refers to"""
+    if isinstance(input_media, types.InputMediaPhoto) and isinstance(input_media.id, types.InputPhoto):
+        return ('photo', input_media.id.id)
+    if isinstance(input_media, types.InputMediaDocument) and isinstance(input_media.id, types.InputDocument):
+        return ('document', input_media.id.id)
+    return None
+
+
+class MediaCache:
+    """Hands out InputMedia for source messages so media is never re-uploaded.
+
+    Photos and documents are re-sent by reference (id, access hash and file
+    reference) and the InputMedia is cached per source media ID, so fan-out,
+    retries and edits reuse one handle. An expired file reference is renewed
+    by refetching the source message. Only when Telegram refuses to send by
+    reference (e.g. a source channel with forwarding restricted) is the file
+    downloaded and uploaded once; the uploaded handle is cached and reused
+    for every other destination.
+    """
+
+    def __init__(self, client, max_entries=5000):
+        self.client = client
+        self.max_entries = max_entries
+        self._media = OrderedDict()
+        self._message_media = OrderedDict()
+        self._upload_locks = {}
+        self._uploaded = set()
+
+    def _remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            evicted, _ = entries.popitem(last=False)
+            self._uploaded.discard(evicted)
+
+    def input_media(self, message):
+        """InputMedia to send for a message, None when there is nothing to attach"""
+        media = message.media
+        if media is None or isinstance(media, TEXT_ONLY_MEDIA):
+            return None
+        key = media_key(media)
+        if key is None:
+            # Polls, contacts, locations, dice...: cheap to rebuild, nothing to cache
+            return utils.get_input_media(media)
+        self._remember(self._message_media, (message.chat_id, message.id), key)
+        cached = self._media.get(key)
+        if cached is None:
+            cached = utils.get_input_media(media)
+            self._remember(self._media, key, cached)
+        else:
+            self._media.move_to_end(key)
+        return cached
+
+    async def media_changed(self, message, fetch_forwarded):
+        """Whether an edited message carries different media than when it was forwarded.
+
+        When the media it was sent with isn't known (a restart or LRU eviction
+        since), fetch_forwarded() fetches the destination's copy to compare
+        with. Media re-uploaded from a restricted source has its own ID there,
+        so after a restart its edits do send the media again.
+        """
+        source = (message.chat_id, message.id)
+        current = media_key(message.media)
+        known = self._message_media.get(source)
+        if known is not None:
+            return known != current
+
+        try:
+            forwarded = await fetch_forwarded()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not fetch the forwarded copy of message {message.id}: {str(e)}")
+            # Only treat it as changed if it has a file at all
+            return current is not None
+        forwarded_key = media_key(forwarded.media) if forwarded is not None else None
+        if forwarded_key == current:
+            if current is not None:
+                self._remember(self._message_media, source, current)
+            return False
+        # A restricted source's media is re-uploaded: the copy holds our upload of it
+        if current in self._uploaded and forwarded_key == input_media_key(self._media.get(current)):
+            self._remember(self._message_media, source, current)
+            return False
+        return True
+
+    async def _refresh(self, message):
+        """Refetch a message to renew its file reference"""
+        fresh = await self.client.get_messages(message.chat_id, ids=message.id)
+        if fresh is None or fresh.media is None:
+            return message
+        self._media.pop(media_key(fresh.media), None)
+        return fresh
+
+    async def _upload_file(self, message):
+        """Download a message's file and upload it again as our own"""
+        data = await self.client.download_media(message, file=bytes)
+        return await self.client.upload_file(data, file_name=message.file.name or f"file{message.file.ext or ''}")
+
+    async def _send(self, messages, send, pack):
+        """Send messages' media through send(), where pack() turns the per-message files into its argument"""
+        try:
+            return await send(pack([self.input_media(m) for m in messages]))
+        except FileReferenceExpiredError:
+            logger.warning(f"⚠️ File reference of message {messages[0].id} expired, refetching")
+            messages = [await self._refresh(m) for m in messages]
+            return await send(pack([self.input_media(m) for m in messages]))
+        except ChatForwardsRestrictedError:
+            keys = tuple(media_key(m.media) for m in messages)
+            if None in keys:
+                raise
+
+        # Sending by reference was refused: upload once, other destinations wait and reuse it
+        lock = self._upload_locks.setdefault(keys, asyncio.Lock())
+        try:
+            async with lock:
+                if all(key in self._uploaded and key in self._media for key in keys):
+                    return await send(pack([self._media[key] for key in keys]))
+
+                logger.info(f"📥 Re-uploading media of message {messages[0].id} (sending by reference refused)")
+                result = await send(pack([await self._upload_file(m) for m in messages]))
+                for key, sent in zip(keys, result if isinstance(result, list) else [result]):
+                    if sent is not None and media_key(sent.media) is not None:
+                        self._remember(self._media, key, utils.get_input_media(sent.media))
+                        self._uploaded.add(key)
+            return result
+        finally:
+            # Also after a failed upload, so the lock doesn't outlive it
+            self._upload_locks.pop(keys, None)
+
+    async def send(self, message, send):
+        """Call send(input_media) for a message, renewing or re-uploading the media if needed"""
+        return await self._send([message], send, lambda files: files[0])
+
+    async def send_album(self, messages, send):
+        """Call send([input_media, ...]) for the items of an album"""
+        return await self._send(messages, send, list)
@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Newest forwarded copy of a source message in each destination
+LOOKUP_QUERY = """
+    SELECT DISTINCT ON (dest_chat_id) dest_chat_id, dest_message_id
+    FROM forwarding_logs
+    WHERE user_id = %s AND source_chat_id = %s AND source_message_id = %s
+    ORDER BY dest_chat_id, created_at DESC
+"""
+
+
+class MessageMap:
+    """Source→destination message ID map with a bounded LRU in front of Postgres.
+
+    A source message can be forwarded to several destinations, so each
+    entry maps (user, source chat, source message) to a
+    {destination chat: destination message} dict. Every forwarded message
+    is already persisted in forwarding_logs, so the table doubles as the
+    durable store. Recent mappings live in memory; a cache miss (e.g. an
+    edit after a restart), or a cached entry lacking one of the destinations
+    the caller expects, falls back to one indexed lookup whose result is
+    merged into the cache. Destinations the lookup didn't find are cached as
+    None, so they aren't looked up again.
+    """
+
+    def __init__(self, db_pool, max_entries=50000):
+        self.db_pool = db_pool
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, user_id, source_chat_id, source_msg_id, dest_chat_id, dest_msg_id):
+        """Remember where a source message was forwarded to in one destination"""
+        key = (user_id, str(source_chat_id), source_msg_id)
+        with self._lock:
+            self._entries.setdefault(key, {})[str(dest_chat_id)] = dest_msg_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _cached(self, key):
+        with self._lock:
+            destinations = self._entries.get(key)
+            if destinations is not None:
+                self._entries.move_to_end(key)
+                return dict(destinations)
+            return None
+
+    def _lookup(self, conn, user_id, source_chat_id, source_msg_id):
+        with conn.cursor() as cur:
+            cur.execute(LOOKUP_QUERY, (user_id, source_chat_id, source_msg_id))
+            return {str(row[0]): row[1] for row in cur.fetchall()}
+
+    async def get(self, user_id, source_chat_id, source_msg_id, expected=()):
+        """Find the destination message IDs per destination chat.
+
+        The database is consulted on a cache miss, or when the cached entry
+        lacks one of the `expected` destination chats.
+        """
+        key = (user_id, str(source_chat_id), source_msg_id)
+        cached = self._cached(key)
+        if cached is not None and all(str(dest_chat_id) in cached for dest_chat_id in expected):
+            return {dest_chat_id: dest_msg_id for dest_chat_id, dest_msg_id in cached.items() if dest_msg_id}
+
+        try:
+            stored = await self.db_pool.run(self._lookup, *key)
+        except Exception as e:
+            logger.error(f"❌ Message map lookup error: {str(e)}")
+            stored = {}
+            expected = ()
+
+        # Cached IDs may not have reached forwarding_logs yet, so they win
+        destinations = {str(dest_chat_id): None for dest_chat_id in expected}
+        destinations.update(stored)
+        destinations.update({dest_chat_id: dest_msg_id for dest_chat_id, dest_msg_id in (cached or {}).items()
+                             if dest_msg_id})
+        for dest_chat_id, dest_msg_id in destinations.items():
+            self.put(*key, dest_chat_id, dest_msg_id)
+        return {dest_chat_id: dest_msg_id for dest_chat_id, dest_msg_id in destinations.items() if dest_msg_id}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_message_map = None
+_message_map_lock = threading.Lock()
+
+
+def get_message_map():
+    """Get the process-wide message ID map"""
+    global _message_map
+    if _message_map is None:
+        with _message_map_lock:
+            if _message_map is None:
+                _message_map = MessageMap(
+                    get_pool(),
+                    max_entries=int(os.getenv('MESSAGE_MAP_CACHE_SIZE', '50000'))
+                )
+    return _message_map
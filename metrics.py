@@ -0,0 +1,249 @@
+import hmac
+import math
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a fast send (tens of ms) up to a FLOOD_WAIT-delayed forward
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Base for a named metric family with optional labels; thread-safe"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for rendering"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, (), value
+
+    def render(self):
+        documentation = self.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+        lines = [f"# HELP {self.name} {documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down, set directly or read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Compute the value on every scrape: a number, or {label values tuple: number} for labelled gauges"""
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            yield from super().samples()
+            return
+        try:
+            values = self._function()
+        except Exception as e:
+            logger.warning(f"⚠️ Gauge {self.name} callback failed: {str(e)}")
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield '', tuple(str(part) for part in key), (), value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, with their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, dict(state, counts=list(state['counts']))) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                yield '_bucket', key, (('le', _format_value(float(bound))),), cumulative
+            yield '_sum', key, (), state['sum']
+            yield '_count', key, (), state['count']
+
+
+class Registry:
+    """Collection of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls, name, documentation, labelnames=(), **kwargs):
+        """Return the metric called `name`, creating it on first use"""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    """Get or create a counter in the process-wide registry"""
+    return REGISTRY.get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    """Get or create a gauge in the process-wide registry"""
+    return REGISTRY.get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    """Get or create a histogram in the process-wide registry"""
+    return REGISTRY.get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render():
+    """Render the process-wide registry"""
+    return REGISTRY.render()
+
+
+def authorized(header, token):
+    """Whether an Authorization header carries the metrics bearer token (never without a token)"""
+    return bool(token) and hmac.compare_digest(header or '', f"Bearer {token}")
+
+
+def serve(port, host='127.0.0.1', token=None):
+    """Expose /metrics on a background HTTP server; returns the server"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            if not authorized(self.headers.get('Authorization'), token):
+                self.send_error(401)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"✅ Metrics served on http://{host}:{port}/metrics")
+    return server
+
+
+# Forward path metrics, shared by the worker modules
+MESSAGES_RECEIVED = counter('forwarder_messages_received_total', 'Source messages received', ['user'])
+MESSAGES_FORWARDED = counter('forwarder_messages_forwarded_total', 'Messages sent to a destination', ['user'])
+MESSAGES_EDITED = counter('forwarder_messages_edited_total', 'Edits applied in a destination', ['user'])
+FORWARD_FAILURES = counter('forwarder_failures_total', 'Forwards and edits that failed for good', ['user'])
+FLOOD_WAITS = counter('forwarder_flood_waits_total', 'FLOOD_WAIT errors returned by Telegram', ['user'])
+
+END_TO_END_SECONDS = histogram('forwarder_end_to_end_seconds',
+                               'Time from a message being posted to the source until it was sent to a destination')
+SEND_SECONDS = histogram('forwarder_send_seconds', 'Round-trip time of one Telegram send or edit request')
+DB_WRITE_SECONDS = histogram('forwarder_db_write_seconds', 'Latency of forwarding database writes', ['operation'])
+REPLACEMENT_SECONDS = histogram('forwarder_replacement_seconds', 'Time spent applying text replacements to a message',
+                                buckets=FAST_BUCKETS)
+
+ACTIVE_SESSIONS = gauge('forwarder_active_sessions', 'Forwarding sessions running in this process')
+SEND_QUEUE_DEPTH = gauge('forwarder_send_queue_depth', 'Messages waiting in an account\'s send queue', ['user'])
+LOG_SINK_QUEUE_DEPTH = gauge('forwarder_log_sink_queue_depth', 'Forwarding logs waiting to be written')
@@ -0,0 +1,225 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import psycopg2
+import backfill
+import catchup
+import channel_catalog
+import message_map
+import outbox
+import overview
+import queries
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Files starting with this line run outside a transaction, one statement at a time
+# (needed for CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION = '-- migrate: no-transaction'
+
+# Files starting with this line lock or rewrite large tables. Startup skips them and
+# applies the rest; `python migrate.py`, run by hand during a maintenance window, applies
+# them. With `-- migrate: manual unless-empty <table>`, startup applies them anyway while
+# that table is missing or empty, since then there is nothing to rewrite.
+MANUAL = re.compile(r'^-- migrate: manual(?: unless-empty (\w+))?')
+
+# Arbitrary key for the advisory lock that keeps processes from migrating at the same time
+LOCK_KEY = 7364201
+
+# Queries on the request and forwarding paths that must stay index-backed. Checked by
+# `python migrate.py --check-plans` with sequential scans disabled: if the planner still
+# picks a Seq Scan on one of these tables, no usable index exists. These are the
+# statements the modules actually run, each with sample parameters.
+HOT_QUERIES = {
+    'primary_account': (queries.PRIMARY_ACCOUNT_QUERY, (1,)),
+    'forwarding_config': (queries.FORWARDING_CONFIG_QUERY, (1,)),
+    'active_replacements': (queries.ACTIVE_REPLACEMENTS_QUERY, (1,)),
+    'replacement_by_original': (queries.REPLACEMENT_BY_ORIGINAL_QUERY, (1, 'x')),
+    'user_routes': (queries.USER_ROUTES_QUERY, (1,)),
+    'accounts_page': (queries.ACCOUNTS_QUERY, (1,)),
+    'user_accounts': (queries.USER_ACCOUNTS_QUERY, (1,)),
+    'existing_accounts': (queries.EXISTING_ACCOUNTS_QUERY, ([1],)),
+    'replacements_for_accounts': (queries.ACCOUNT_REPLACEMENTS_QUERY, ([1],)),
+    'overview': (overview.OVERVIEW_QUERY, (1,)),
+    'message_map_lookup': (message_map.LOOKUP_QUERY, (1, -1001, 1)),
+    'last_forwarded': (catchup.LAST_FORWARDED_QUERY, (1, -1001)),
+    'outbox_claim': (outbox.CLAIM_QUERY, (1, 2, 0, [-1001], 50)),
+    'backfill_jobs_for_user': (backfill.LIST_JOBS_QUERY, (1, 20)),
+    'active_backfill_jobs': (backfill.ACTIVE_JOBS_QUERY, ([1], list(backfill.ACTIVE_STATUSES))),
+    'channel_catalog': (channel_catalog.CHANNELS_QUERY, (1,)),
+}
+
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    """List (version, name, path) for every numbered .sql file, in order"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = re.match(r'^(\d+)_(.+)\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+
+def _statements(sql):
+    """Split a migration into single statements (comments dropped)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def _acquire_lock(conn, timeout):
+    """Wait for the migration lock without holding a statement open, so a
+    concurrent CREATE INDEX CONCURRENTLY in another process isn't blocked by us"""
+    deadline = time.monotonic() + timeout
+    with conn.cursor() as cur:
+        while True:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_KEY,))
+            if cur.fetchone()[0]:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for another process to finish migrating")
+            time.sleep(1)
+
+
+def _is_empty(cur, table):
+    """Whether a table is missing or has no rows"""
+    cur.execute("SELECT to_regclass(%s)", (table,))
+    if cur.fetchone()[0] is None:
+        return True
+    cur.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {table})")
+    return cur.fetchone()[0]
+
+
+def applied_versions(cur):
+    """Return the versions already recorded in schema_migrations, creating it if needed"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(dsn=None, lock_timeout=600, manual=False):
+    """Apply every migration that hasn't been applied yet; returns the versions applied.
+
+    Without `manual`, pending manual migrations are skipped with a warning
+    (unless their unless-empty table is empty) and the others still run.
+    """
+    conn = psycopg2.connect(dsn or os.getenv('DATABASE_URL'))
+    conn.autocommit = True
+    applied = []
+    try:
+        _acquire_lock(conn, lock_timeout)
+        with conn.cursor() as cur:
+            done = applied_versions(cur)
+        for version, name, path in available_migrations():
+            if version in done:
+                continue
+            with open(path) as f:
+                sql = f.read()
+            marker = MANUAL.match(sql.lstrip())
+            if marker and not manual:
+                with conn.cursor() as cur:
+                    deferred = not (marker.group(1) and _is_empty(cur, marker.group(1)))
+                if deferred:
+                    logger.warning(
+                        f"⚠️ Skipped migration {version:03d}_{name}: apply it by hand with `python migrate.py` "
+                        f"while the forwarding workers are stopped"
+                    )
+                    continue
+
+            started = time.perf_counter()
+            if sql.lstrip().startswith(NO_TRANSACTION):
+                with conn.cursor() as cur:
+                    for statement in _statements(sql):
+                        cur.execute(statement)
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            else:
+                conn.autocommit = False
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(sql)
+                        cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+            applied.append(version)
+            logger.info(f"✅ Applied migration {version:03d}_{name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+    finally:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        except Exception:
+            pass
+        conn.close()
+    return applied
+
+
+def _seq_scans(plan, tables):
+    """Collect the hot tables a plan reads with a sequential scan"""
+    found = []
+    relation = plan.get('Relation Name', '')
+    # Partitions (forwarding_logs_y2025m01, ...) count as their parent table
+    parent = next((table for table in tables if relation == table or relation.startswith(table + '_')), None)
+    if plan.get('Node Type') == 'Seq Scan' and parent:
+        found.append(relation)
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scans(child, tables))
+    return found
+
+
+def check_plans(dsn=None, queries=HOT_QUERIES):
+    """EXPLAIN every hot query and return {name: [tables read by seq scan]} for regressions"""
+    tables = {
+        'users', 'telegram_accounts', 'forwarding_configs', 'text_replacements',
+        'forwarding_logs', 'forwarding_stats', 'telegram_channels', 'forwarding_routes',
+        'forwarding_outbox', 'backfill_jobs'
+    }
+    conn = psycopg2.connect(dsn or os.getenv('DATABASE_URL'))
+    regressions = {}
+    try:
+        with conn.cursor() as cur:
+            # Make a seq scan the last resort: it only shows up if no index can serve the query
+            cur.execute("SET enable_seqscan = off")
+            for name, (sql, params) in queries.items():
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = _seq_scans(plan[0]['Plan'], tables)
+                if scans:
+                    regressions[name] = scans
+        conn.rollback()
+    finally:
+        conn.close()
+    return regressions
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument('--check-plans', action='store_true',
+                        help="fail if a hot query is planned as a sequential scan")
+    args = parser.parse_args()
+
+    applied = migrate(manual=True)
+    logger.info(f"Database is up to date ({len(applied)} migrations applied)")
+
+    if args.check_plans:
+        regressions = check_plans()
+        for name, scans in regressions.items():
+            logger.error(f"❌ {name}: sequential scan on {', '.join(scans)}")
+        if regressions:
+            sys.exit(1)
+        logger.info(f"✅ All {len(HOT_QUERIES)} hot queries are index-backed")
@@ -0,0 +1,72 @@
+-- Tables the dashboard and the forwarder have always used. Existing databases
+-- already have them, so every statement is a no-op there.
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    telegram_id BIGINT,
+    is_logged_in BOOLEAN NOT NULL DEFAULT false,
+    last_login_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS telegram_accounts (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    telegram_id BIGINT NOT NULL,
+    telegram_username TEXT,
+    auth_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    session_string TEXT NOT NULL,
+    is_primary BOOLEAN NOT NULL DEFAULT false,
+    is_active BOOLEAN NOT NULL DEFAULT true,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS forwarding_configs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    source_channel BIGINT,
+    destination_channel BIGINT,
+    is_active BOOLEAN NOT NULL DEFAULT false,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS text_replacements (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    original_text TEXT NOT NULL,
+    replacement_text TEXT NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT true,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- user_id holds the telegram_id of the account that forwarded the message
+CREATE TABLE IF NOT EXISTS forwarding_logs (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    source_message_id BIGINT NOT NULL,
+    dest_message_id BIGINT NOT NULL,
+    source_chat_id BIGINT NOT NULL,
+    dest_chat_id BIGINT NOT NULL,
+    message_text TEXT,
+    received_at BIGINT,
+    forwarded_at BIGINT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Legacy per-user channel and run state, superseded by forwarding_configs
+CREATE TABLE IF NOT EXISTS channel_config (
+    user_id BIGINT PRIMARY KEY,
+    source_channel BIGINT,
+    destination_channel BIGINT,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bot_status (
+    user_id BIGINT PRIMARY KEY,
+    is_running BOOLEAN NOT NULL DEFAULT false,
+    session_string TEXT,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,34 @@
+-- migrate: no-transaction
+-- Indexes behind the dashboard and forwarder queries. Built CONCURRENTLY so a
+-- live forwarding_logs table keeps taking writes while they are created.
+
+-- Primary account lookups (login, /forwarding, /dashboard, /bot/toggle, worker sync)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_telegram_accounts_user_primary
+    ON telegram_accounts (user_id, is_primary);
+
+-- verify-otp ownership check and per-account joins
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_telegram_accounts_telegram_id
+    ON telegram_accounts (telegram_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_forwarding_configs_user
+    ON forwarding_configs (user_id);
+
+-- Workers only ever look for switched-on configs
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_forwarding_configs_active
+    ON forwarding_configs (user_id) WHERE is_active;
+
+-- Duplicate check, toggle and removal by original text
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_text_replacements_user_original
+    ON text_replacements (user_id, original_text);
+
+-- Replacement loading joins text_replacements to users by telegram_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_telegram_id
+    ON users (telegram_id);
+
+-- Recent logs on the dashboard
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_forwarding_logs_user_created
+    ON forwarding_logs (user_id, created_at DESC);
+
+-- Message map fallback when an edit arrives for an uncached message
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_forwarding_logs_source_message
+    ON forwarding_logs (user_id, source_chat_id, source_message_id);
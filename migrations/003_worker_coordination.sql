@@ -0,0 +1,14 @@
+-- Worker heartbeats and session leases used by FORWARDING_MODE=workers
+
+CREATE TABLE IF NOT EXISTS forwarding_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS session_owners (
+    telegram_id BIGINT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_owners_worker ON session_owners (worker_id);
@@ -0,0 +1,14 @@
+-- Cached channel list per Telegram account for the forwarding page
+
+CREATE TABLE IF NOT EXISTS telegram_channels (
+    telegram_id BIGINT NOT NULL,
+    channel_id BIGINT NOT NULL,
+    name TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (telegram_id, channel_id)
+);
+
+CREATE TABLE IF NOT EXISTS channel_catalog_refreshes (
+    telegram_id BIGINT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL
+);
@@ -0,0 +1,16 @@
+-- Per-account forwarding counters maintained by the log sink
+
+CREATE TABLE IF NOT EXISTS forwarding_stats (
+    telegram_id BIGINT PRIMARY KEY,
+    messages_forwarded BIGINT NOT NULL DEFAULT 0,
+    failures BIGINT NOT NULL DEFAULT 0,
+    last_forwarded_at TIMESTAMPTZ,
+    last_failure_at TIMESTAMPTZ
+);
+
+-- Seed from the logs written before the counters existed
+INSERT INTO forwarding_stats (telegram_id, messages_forwarded, last_forwarded_at)
+SELECT user_id, COUNT(*), MAX(created_at)
+FROM forwarding_logs
+GROUP BY user_id
+ON CONFLICT (telegram_id) DO NOTHING;
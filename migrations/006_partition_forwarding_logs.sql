@@ -0,0 +1,80 @@
+-- migrate: manual unless-empty forwarding_logs
+-- Turn forwarding_logs into a table range-partitioned by month on created_at, so
+-- old months can be archived and dropped as whole partitions (see log_retention.py).
+-- Existing rows are copied across inside this migration's transaction, which holds
+-- an exclusive lock on forwarding_logs for the whole copy. On a database with logs
+-- it's therefore only applied by hand (`python migrate.py`) with the forwarding
+-- workers stopped; until then the later migrations run against the old table.
+
+ALTER TABLE forwarding_logs RENAME TO forwarding_logs_legacy;
+ALTER SEQUENCE IF EXISTS forwarding_logs_id_seq RENAME TO forwarding_logs_legacy_id_seq;
+
+CREATE TABLE forwarding_logs (
+    id BIGSERIAL,
+    user_id BIGINT NOT NULL,
+    source_message_id BIGINT NOT NULL,
+    dest_message_id BIGINT NOT NULL,
+    source_chat_id BIGINT NOT NULL,
+    dest_chat_id BIGINT NOT NULL,
+    message_text TEXT,
+    received_at BIGINT,
+    forwarded_at BIGINT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    receive_ms INTEGER,
+    transform_ms INTEGER,
+    queue_ms INTEGER,
+    send_ms INTEGER,
+    persist_ms INTEGER,
+    total_ms INTEGER,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Safety net for rows outside every monthly partition; maintenance keeps it empty
+CREATE TABLE forwarding_logs_default PARTITION OF forwarding_logs DEFAULT;
+
+-- One partition per month from the oldest log up to two months ahead
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+    last_month TIMESTAMP := date_trunc('month', CURRENT_TIMESTAMP::timestamp) + INTERVAL '2 months';
+BEGIN
+    SELECT date_trunc('month', COALESCE(MIN(created_at), CURRENT_TIMESTAMP::timestamp))
+    INTO month_start
+    FROM forwarding_logs_legacy;
+
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF forwarding_logs FOR VALUES FROM (%L) TO (%L)',
+            'forwarding_logs_' || to_char(month_start, '"y"YYYY"m"MM'),
+            month_start,
+            month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+END $$;
+
+-- Copy every column the old table has; those added by later migrations (010) only
+-- exist there if this one was deferred
+DO $$
+DECLARE
+    columns TEXT;
+BEGIN
+    SELECT string_agg(quote_ident(legacy.column_name), ', ' ORDER BY legacy.ordinal_position)
+    INTO columns
+    FROM information_schema.columns legacy
+    JOIN information_schema.columns partitioned
+      ON partitioned.table_schema = legacy.table_schema
+     AND partitioned.table_name = 'forwarding_logs'
+     AND partitioned.column_name = legacy.column_name
+    WHERE legacy.table_schema = current_schema() AND legacy.table_name = 'forwarding_logs_legacy';
+
+    EXECUTE format('INSERT INTO forwarding_logs (%s) SELECT %s FROM forwarding_logs_legacy', columns, columns);
+END $$;
+
+SELECT setval('forwarding_logs_id_seq', COALESCE((SELECT MAX(id) FROM forwarding_logs), 0) + 1, false);
+
+DROP TABLE forwarding_logs_legacy;
+
+-- Indexes on the parent are created on every partition, present and future
+CREATE INDEX idx_forwarding_logs_user_created ON forwarding_logs (user_id, created_at DESC);
+CREATE INDEX idx_forwarding_logs_source_message ON forwarding_logs (user_id, source_chat_id, source_message_id);
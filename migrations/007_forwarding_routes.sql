@@ -0,0 +1,11 @@
+-- Extra source → destination routes per user. The pair in forwarding_configs stays
+-- the main route; every route here is forwarded in addition to it.
+
+CREATE TABLE IF NOT EXISTS forwarding_routes (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    source_channel BIGINT NOT NULL,
+    destination_channel BIGINT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, source_channel, destination_channel)
+);
@@ -0,0 +1,30 @@
+-- Durable outbox: every received message (or album) is stored here, one row per
+-- destination, before it is sent, so a crash or restart never loses a forward.
+-- The unique key makes enqueueing idempotent when Telegram re-delivers an update.
+
+CREATE TABLE IF NOT EXISTS forwarding_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    source_chat_id BIGINT NOT NULL,
+    source_message_id BIGINT NOT NULL,
+    dest_chat_id BIGINT NOT NULL,
+    messages BYTEA[] NOT NULL,
+    texts TEXT[] NOT NULL,
+    received_at BIGINT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    dest_message_ids BIGINT[],
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, source_chat_id, source_message_id, dest_chat_id)
+);
+
+-- Senders claim an account's unfinished rows in arrival order
+CREATE INDEX IF NOT EXISTS idx_forwarding_outbox_unfinished
+    ON forwarding_outbox (user_id, id) WHERE status IN ('pending', 'sending');
+
+-- Finished rows are purged by age
+CREATE INDEX IF NOT EXISTS idx_forwarding_outbox_finished
+    ON forwarding_outbox (updated_at) WHERE status IN ('done', 'failed');
@@ -0,0 +1,25 @@
+-- Historical backfill jobs started from the dashboard. The message range is fixed
+-- when a job first runs; checkpoint_id records how far it has queued, so a paused,
+-- restarted or crashed job resumes from there.
+
+CREATE TABLE IF NOT EXISTS backfill_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    telegram_id BIGINT NOT NULL,
+    source_channel BIGINT NOT NULL,
+    destination_channel BIGINT NOT NULL,
+    message_limit INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    start_after_id BIGINT,
+    end_at_id BIGINT,
+    checkpoint_id BIGINT,
+    messages_copied INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_backfill_jobs_user ON backfill_jobs (user_id, id DESC);
+CREATE INDEX IF NOT EXISTS idx_backfill_jobs_active
+    ON backfill_jobs (telegram_id) WHERE status IN ('pending', 'running');
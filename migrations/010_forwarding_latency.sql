@@ -0,0 +1,18 @@
+-- Per-stage forwarding latency, in whole milliseconds. The outbox carries when a
+-- message was received and how long its transform took, so the sender can log the
+-- time it spent queued. receive_ms and total_ms are measured from the source post
+-- time and stay NULL for replayed and backfilled history. The partitioned table from
+-- 006 already has the forwarding_logs columns; they're added here in case 006 is
+-- still waiting to be applied by hand.
+
+ALTER TABLE forwarding_outbox
+    ADD COLUMN IF NOT EXISTS received_at_ms BIGINT,
+    ADD COLUMN IF NOT EXISTS transform_ms INTEGER;
+
+ALTER TABLE forwarding_logs
+    ADD COLUMN IF NOT EXISTS receive_ms INTEGER,
+    ADD COLUMN IF NOT EXISTS transform_ms INTEGER,
+    ADD COLUMN IF NOT EXISTS queue_ms INTEGER,
+    ADD COLUMN IF NOT EXISTS send_ms INTEGER,
+    ADD COLUMN IF NOT EXISTS persist_ms INTEGER,
+    ADD COLUMN IF NOT EXISTS total_ms INTEGER;
@@ -0,0 +1,11 @@
+-- Telegram logins between send-otp and verify-otp. The half-finished login's
+-- session (auth key and data centre) and phone_code_hash are kept here, so
+-- verify-otp can be served by any dashboard worker process.
+
+CREATE TABLE IF NOT EXISTS pending_logins (
+    user_id INTEGER PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+    phone TEXT NOT NULL,
+    phone_code_hash TEXT NOT NULL,
+    session_string TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
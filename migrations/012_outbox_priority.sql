@@ -0,0 +1,11 @@
+-- migrate: no-transaction
+-- Live messages are claimed ahead of queued catch-up and backfill history, so new
+-- posts don't wait behind a long backlog. 0 is live, 1 is history (outbox.LIVE and
+-- outbox.BACKLOG). The claim index leads with the priority to match its ORDER BY.
+
+ALTER TABLE forwarding_outbox ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 0;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_forwarding_outbox_claim
+    ON forwarding_outbox (user_id, priority, id) WHERE status IN ('pending', 'sending');
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_forwarding_outbox_unfinished;
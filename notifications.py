@@ -0,0 +1,101 @@
+import json
+import logging
+import asyncio
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel carrying forwarding config/status changes from the web app to the workers
+CHANNEL = 'forwarding_events'
+
+
+def notify_change(cur, kind, user_id, **extra):
+    """Tell the forwarding workers that a user's forwarding setup changed.
+
+    The notification is delivered when the surrounding transaction commits
+    (immediately on autocommit connections).
+    """
+    payload = json.dumps({'type': kind, 'user_id': user_id, **extra})
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+
+
+async def publish_change(db_pool, kind, user_id=None, **extra):
+    """Emit a change notification from async code using a pooled connection"""
+    def _publish(conn):
+        with conn.cursor() as cur:
+            notify_change(cur, kind, user_id, **extra)
+    await db_pool.run(_publish)
+
+
+class ChangeListener:
+    """Holds one LISTEN connection and hands each notification to `callback`.
+
+    The connection's socket is watched with loop.add_reader, so waiting for
+    notifications costs no queries and no threads. After every (re)connect
+    the callback receives a {'type': 'resync'} event, because anything sent
+    while the connection was down has been missed.
+    """
+
+    def __init__(self, dsn, callback, channel=CHANNEL, reconnect_delay=5):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._callback = callback
+        self._conn = None
+        self._lost = None
+
+    async def _connect(self):
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, psycopg2.connect, self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            if not self._lost.done():
+                self._lost.set_exception(e)
+            return
+
+        while self._conn.notifies:
+            notification = self._conn.notifies.pop(0)
+            try:
+                event = json.loads(notification.payload)
+            except ValueError:
+                logger.warning(f"⚠️ Ignoring malformed notification: {notification.payload!r}")
+                continue
+            self._dispatch(event)
+
+    def _dispatch(self, event):
+        try:
+            self._callback(event)
+        except Exception as e:
+            logger.error(f"❌ Change notification handler error: {str(e)}")
+
+    async def run(self):
+        """Listen until cancelled, reconnecting whenever the connection drops"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                self._conn = await self._connect()
+                self._lost = loop.create_future()
+                loop.add_reader(self._conn.fileno(), self._on_readable)
+                logger.info(f"✅ Listening for changes on '{self.channel}'")
+                self._dispatch({'type': 'resync'})
+                await self._lost
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Change listener error: {str(e)}")
+            finally:
+                if self._conn is not None:
+                    try:
+                        loop.remove_reader(self._conn.fileno())
+                    except Exception:
+                        pass
+                    self._conn.close()
+                    self._conn = None
+            await asyncio.sleep(self.reconnect_delay)
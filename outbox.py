@@ -0,0 +1,275 @@
+import logging
+import time
+import asyncio
+from collections import deque
+import psycopg2
+from psycopg2.extras import execute_values, DictCursor
+from telethon.extensions import BinaryReader
+from log_sink import get_log_sink
+from metrics import DB_WRITE_SECONDS, FORWARD_FAILURES
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLUMNS = (
+    'user_id', 'source_chat_id', 'source_message_id', 'dest_chat_id',
+    'messages', 'texts', 'received_at', 'received_at_ms', 'transform_ms', 'priority'
+)
+
+# Claim order: live messages go ahead of queued catch-up and backfill history
+LIVE = 0
+BACKLOG = 1
+
+
+def serialize_messages(messages):
+    """Encode Telethon messages as TL bytes for the outbox"""
+    return [psycopg2.Binary(bytes(message)) for message in messages]
+
+
+def load_messages(client, payloads):
+    """Rebuild Telethon messages from their stored TL bytes"""
+    messages = []
+    for payload in payloads:
+        message = BinaryReader(bytes(payload)).tgread_object()
+        message._finish_init(client, {}, None)
+        messages.append(message)
+    return messages
+
+
+def enqueue(conn, entries):
+    """Store outbox entries, skipping ones already queued; returns how many were new"""
+    if not entries:
+        return 0
+    rows = [tuple(entry[column] for column in OUTBOX_COLUMNS) for entry in entries]
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        inserted = execute_values(cur, f"""
+            INSERT INTO forwarding_outbox ({', '.join(OUTBOX_COLUMNS)})
+            VALUES %s
+            ON CONFLICT (user_id, source_chat_id, source_message_id, dest_chat_id) DO NOTHING
+            RETURNING id
+        """, rows, page_size=len(rows), fetch=True)
+    DB_WRITE_SECONDS.observe(time.perf_counter() - started, operation='outbox')
+    return len(inserted)
+
+
+def recover(conn, user_id):
+    """Re-queue entries a previous run of this session claimed but never finished"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE forwarding_outbox
+            SET status = 'pending', updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = %s AND status = 'sending'
+        """, (user_id,))
+        return cur.rowcount
+
+
+def pending_count(conn, user_id):
+    """Number of an account's entries not sent yet"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT COUNT(*) FROM forwarding_outbox
+            WHERE user_id = %s AND status IN ('pending', 'sending')
+        """, (user_id,))
+        return cur.fetchone()[0]
+
+
+CLAIM_QUERY = """
+    UPDATE forwarding_outbox
+    SET status = 'sending', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id IN (
+        SELECT id FROM forwarding_outbox
+        WHERE user_id = %s AND status = 'pending' AND available_at <= CURRENT_TIMESTAMP
+          AND mod(abs(dest_chat_id), %s) = %s
+          AND NOT (dest_chat_id = ANY(%s::bigint[]))
+        ORDER BY priority, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, source_chat_id, source_message_id, dest_chat_id, messages, texts, received_at,
+              received_at_ms, transform_ms, attempts, priority
+"""
+
+
+def claim(conn, user_id, shard=0, shards=1, limit=50, skip=()):
+    """Mark up to `limit` due entries of one sender shard as sending and return them in order.
+
+    Live entries come before catch-up and backfill history; each kind keeps
+    its arrival order. Destinations are split between shards, so each
+    destination is only ever sent to by one sender. Destinations in `skip` already
+    have a full lane and are left for a later claim. SKIP LOCKED lets a
+    concurrent claim pass over rows instead of waiting for them.
+    """
+    with conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(CLAIM_QUERY, (user_id, shards, shard, list(skip), limit))
+        return sorted((dict(row) for row in cur.fetchall()), key=lambda entry: (entry['priority'], entry['id']))
+
+
+def complete(conn, entry_id, dest_message_ids):
+    """Mark an entry as sent"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE forwarding_outbox
+            SET status = 'done', dest_message_ids = %s, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (dest_message_ids, entry_id))
+
+
+def retry(conn, entry_id, error):
+    """Count a failed attempt at an entry that its sender is about to try again"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE forwarding_outbox
+            SET attempts = attempts + 1, last_error = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (error, entry_id))
+
+
+def fail(conn, entry_id, error):
+    """Give up on an entry"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE forwarding_outbox
+            SET status = 'failed', last_error = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (error, entry_id))
+
+
+def purge(conn, retention_days):
+    """Delete finished entries older than the retention window; returns the number removed"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM forwarding_outbox
+            WHERE status IN ('done', 'failed')
+              AND updated_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+        """, (retention_days,))
+        return cur.rowcount
+
+
+class OutboxSender:
+    """Sends one account's outbox entries for its shard of destinations.
+
+    Claimed entries are queued in memory per destination, and every
+    destination has its own lane task sending them one at a time in order,
+    so a slow or flood-waited destination only holds up itself. A failed
+    entry is retried in place with exponential backoff, holding the rest of
+    its lane so the destination keeps its order, and is marked failed after
+    max_attempts. At most batch_size entries wait in a lane; a full lane's
+    destination is skipped when claiming. deliver(entry) returns the
+    destination message IDs, and an entry is only marked done after it was
+    sent, so a crash in between re-sends it (at-least-once delivery).
+    """
+
+    def __init__(self, db_pool, user_id, deliver, shard=0, shards=1, batch_size=50,
+                 poll_interval=5.0, max_attempts=5):
+        self.db_pool = db_pool
+        self.user_id = user_id
+        self.deliver = deliver
+        self.shard = shard
+        self.shards = shards
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._lanes = {}  # dest_chat_id: deque of claimed entries, the head being sent
+        self._tasks = {}  # dest_chat_id: lane task
+
+    def wake(self):
+        """Claim new entries now instead of at the next poll"""
+        self._wake.set()
+
+    async def run(self):
+        """Claim entries into the destination lanes until cancelled"""
+        try:
+            while True:
+                self._wake.clear()
+                full = [dest for dest, lane in self._lanes.items() if len(lane) >= self.batch_size]
+                try:
+                    entries = await self.db_pool.run(
+                        claim, self.user_id, self.shard, self.shards, self.batch_size, full
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Outbox claim error for user {self.user_id}: {str(e)}")
+                    entries = []
+
+                for entry in entries:
+                    self._queue(entry)
+                # A full batch means more are probably due
+                if len(entries) >= self.batch_size:
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._tasks.values()):
+                task.cancel()
+
+    def _queue(self, entry):
+        dest = entry['dest_chat_id']
+        lane = self._lanes.get(dest)
+        if lane is None:
+            lane = self._lanes[dest] = deque()
+            self._tasks[dest] = asyncio.get_running_loop().create_task(self._send_lane(dest, lane))
+        # Ahead of lower-priority entries already waiting, but never ahead of the head being sent
+        index = len(lane)
+        while index > 1 and lane[index - 1]['priority'] > entry['priority']:
+            index -= 1
+        lane.insert(index, entry)
+
+    async def _send_lane(self, dest, lane):
+        """Send one destination's entries in order until its lane is empty"""
+        try:
+            while lane:
+                await self._send(lane[0])
+                lane.popleft()
+                # The lane has room again: let the claimer fill it
+                if len(lane) == self.batch_size - 1:
+                    self.wake()
+        finally:
+            self._lanes.pop(dest, None)
+            self._tasks.pop(dest, None)
+
+    async def _send(self, entry):
+        """Deliver an entry, retrying it in place until it is sent or given up on"""
+        while True:
+            try:
+                dest_message_ids = await self.deliver(entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = await self._failed(entry, e)
+                if delay is None:
+                    return
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                await self.db_pool.run(complete, entry['id'], dest_message_ids)
+            except Exception as e:
+                # Left as sending: re-sent when the session restarts
+                logger.error(f"❌ Could not mark outbox entry {entry['id']} done: {str(e)}")
+            return
+
+    async def _failed(self, entry, error):
+        """Record a failed attempt; returns the delay before retrying, or None once given up"""
+        if entry['attempts'] >= self.max_attempts:
+            try:
+                get_log_sink().record_failure(self.user_id, len(entry['messages']))
+                FORWARD_FAILURES.inc(user=self.user_id)
+                await self.db_pool.run(fail, entry['id'], str(error))
+            except Exception as e:
+                logger.error(f"❌ Outbox update error for entry {entry['id']}: {str(e)}")
+            logger.error(f"❌ Forward of message {entry['source_message_id']} to {entry['dest_chat_id']} "
+                         f"failed after {entry['attempts']} attempts: {str(error)}")
+            return None
+
+        delay = min(5 * 2 ** (entry['attempts'] - 1), 600)
+        try:
+            await self.db_pool.run(retry, entry['id'], str(error))
+        except Exception as e:
+            logger.error(f"❌ Outbox update error for entry {entry['id']}: {str(e)}")
+        entry['attempts'] += 1
+        logger.warning(f"⚠️ Forward of message {entry['source_message_id']} to {entry['dest_chat_id']} "
+                       f"failed ({str(error)}), retry {entry['attempts']}/{self.max_attempts} in {delay}s")
+        return delay
@@ -0,0 +1,146 @@
+import threading
+import time
+
+# Only the newest forwarding_logs partitions are searched for the recent activity list
+RECENT_LOG_WINDOW = '30 days'
+
+# Latency percentiles cover the forwards logged in this window
+LATENCY_WINDOW = '24 hours'
+
+# forwarding_logs latency columns, in pipeline order, with their dashboard labels
+LATENCY_STAGES = (
+    ('receive_ms', 'Posted → received'),
+    ('transform_ms', 'Transform'),
+    ('queue_ms', 'Queued'),
+    ('send_ms', 'Send'),
+    ('persist_ms', 'Log write'),
+    ('total_ms', 'End to end'),
+)
+
+_PERCENTILES = (',\n' + ' ' * 23).join(
+    f"percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY {column}) AS {column}"
+    for column, _ in LATENCY_STAGES
+)
+
+# One statement for everything the dashboard overview shows. Forwarding logs are
+# keyed by the Telegram account that forwarded them, so they follow the primary account.
+OVERVIEW_QUERY = f"""
+    SELECT ta.telegram_id, ta.telegram_username, ta.auth_date,
+           fc.source_channel, fc.destination_channel, COALESCE(fc.is_active, false) AS is_active,
+           (SELECT COUNT(*) FROM text_replacements tr WHERE tr.user_id = u.id) AS replacements_count,
+           (SELECT COALESCE(json_agg(l), '[]'::json)
+            FROM (
+                SELECT source_message_id, dest_message_id, message_text, received_at, forwarded_at, total_ms
+                FROM forwarding_logs
+                WHERE user_id = ta.telegram_id
+                  AND created_at >= LOCALTIMESTAMP - INTERVAL '{RECENT_LOG_WINDOW}'
+                ORDER BY created_at DESC
+                LIMIT 5
+            ) l) AS forwarding_logs,
+           (SELECT COALESCE(json_agg(p ORDER BY p.source_chat_id NULLS FIRST, p.dest_chat_id), '[]'::json)
+            FROM (
+                -- The empty grouping set adds the account-wide row, with NULL chat IDs
+                SELECT source_chat_id, dest_chat_id, COUNT(*) AS messages,
+                       {_PERCENTILES}
+                FROM forwarding_logs
+                WHERE user_id = ta.telegram_id
+                  AND created_at >= LOCALTIMESTAMP - INTERVAL '{LATENCY_WINDOW}'
+                GROUP BY GROUPING SETS ((), (source_chat_id, dest_chat_id))
+            ) p) AS latency
+    FROM users u
+    LEFT JOIN telegram_accounts ta ON ta.user_id = u.id AND ta.is_primary = true
+    LEFT JOIN forwarding_configs fc ON fc.user_id = u.id
+    WHERE u.id = %s
+    LIMIT 1
+"""
+
+
+def fetch_overview(cur, user_id):
+    """Load the dashboard overview for a user in a single round-trip"""
+    cur.execute(OVERVIEW_QUERY, (user_id,))
+    row = cur.fetchone()
+    if not row:
+        return {
+            'telegram_authorized': False,
+            'telegram_username': None,
+            'telegram_auth_date': None,
+            'source_channel': None,
+            'dest_channel': None,
+            'is_active': False,
+            'replacements_count': 0,
+            'forwarding_logs': [],
+            'latency': []
+        }
+    return {
+        'telegram_authorized': row['telegram_id'] is not None,
+        'telegram_username': row['telegram_username'],
+        'telegram_auth_date': row['auth_date'],
+        'source_channel': row['source_channel'],
+        'dest_channel': row['destination_channel'],
+        'is_active': row['is_active'],
+        'replacements_count': row['replacements_count'],
+        'forwarding_logs': row['forwarding_logs'],
+        'latency': latency_rows(row['latency'])
+    }
+
+
+def latency_rows(groups):
+    """Shape percentile groups for the dashboard: the account-wide row first, then one per route"""
+    rows = []
+    for group in groups:
+        if not group['messages']:
+            continue
+        rows.append({
+            'source_chat_id': group['source_chat_id'],
+            'dest_chat_id': group['dest_chat_id'],
+            'messages': group['messages'],
+            'stages': [
+                (label, [None if value is None else round(value) for value in group[column] or (None, None, None)])
+                for column, label in LATENCY_STAGES
+            ]
+        })
+    return rows
+
+
+class OverviewCache:
+    """Short-lived per-user cache of overview data.
+
+    Entries expire after `ttl` seconds and are dropped as soon as a write
+    route changes the user's setup, in this process directly and in the
+    others through their change listener, so polling the dashboard mostly
+    hits memory instead of the database.
+    """
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, load):
+        """Return the cached overview for a user, calling load() on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached and cached[0] > now:
+                return cached[1]
+            generation = cached[2] if cached else 0
+
+        data = load()
+        with self._lock:
+            current = self._entries.get(user_id)
+            # Don't store a result that an invalidation raced past
+            if (current[2] if current else 0) == generation:
+                self._entries[user_id] = (time.monotonic() + self.ttl, data, generation)
+        return data
+
+    def invalidate(self, user_id):
+        """Forget a user's overview after their accounts, config or replacements change"""
+        with self._lock:
+            cached = self._entries.get(user_id)
+            self._entries[user_id] = (0, None, (cached[2] if cached else 0) + 1)
+
+    def clear(self):
+        """Forget every user's overview"""
+        with self._lock:
+            for user_id, cached in list(self._entries.items()):
+                self._entries[user_id] = (0, None, cached[2] + 1)
@@ -0,0 +1,65 @@
+"""SQL run on the dashboard's and the workers' hot paths.
+
+app.py and main.py execute these statements as they are, and migrate.py's plan
+check EXPLAINs the very same strings, so a slow change to one shows up there.
+"""
+
+PRIMARY_ACCOUNT_QUERY = """
+    SELECT telegram_id, telegram_username, auth_date, session_string
+    FROM telegram_accounts
+    WHERE user_id = %s AND is_primary = true AND is_active = true
+"""
+
+FORWARDING_CONFIG_QUERY = """
+    SELECT source_channel, destination_channel, is_active
+    FROM forwarding_configs
+    WHERE user_id = %s
+"""
+
+ACTIVE_REPLACEMENTS_QUERY = """
+    SELECT original_text, replacement_text
+    FROM text_replacements
+    WHERE user_id = %s AND is_active = true
+"""
+
+USER_ROUTES_QUERY = """
+    SELECT id, source_channel, destination_channel
+    FROM forwarding_routes
+    WHERE user_id = %s
+    ORDER BY id
+"""
+
+REPLACEMENT_BY_ORIGINAL_QUERY = """
+    SELECT id, is_active
+    FROM text_replacements
+    WHERE user_id = %s AND original_text = %s
+"""
+
+# The accounts page: every account of a user with its config and counters
+ACCOUNTS_QUERY = """
+    SELECT
+        ta.*,
+        fc.source_channel,
+        fc.destination_channel,
+        fc.is_active as forwarding_active,
+        fs.messages_forwarded as messages_count,
+        fs.failures as failures_count,
+        fs.last_forwarded_at
+    FROM telegram_accounts ta
+    LEFT JOIN forwarding_configs fc ON fc.user_id = ta.user_id
+    LEFT JOIN forwarding_stats fs ON fs.telegram_id = ta.telegram_id
+    WHERE ta.user_id = %s
+    ORDER BY ta.is_primary DESC, ta.auth_date DESC
+"""
+
+USER_ACCOUNTS_QUERY = "SELECT telegram_id FROM telegram_accounts WHERE user_id = %s"
+
+EXISTING_ACCOUNTS_QUERY = "SELECT telegram_id FROM telegram_accounts WHERE telegram_id = ANY(%s)"
+
+# Active replacement rules of several running sessions at once
+ACCOUNT_REPLACEMENTS_QUERY = """
+    SELECT u.telegram_id, t.original_text, t.replacement_text
+    FROM text_replacements t
+    JOIN users u ON u.id = t.user_id
+    WHERE u.telegram_id = ANY(%s) AND t.is_active = true
+"""
@@ -0,0 +1,114 @@
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Up to this many rules a str.find per rule beats the compiled regex; they break
+# even at about 50 rules (see benchmarks/bench_replacements.py)
+SCAN_MAX_RULES = int(os.getenv('REPLACEMENT_SCAN_MAX_RULES', '32'))
+
+
+def _trie_pattern(words):
+    """Build a regex from a character trie of the words.
+
+    Alternatives branch on one character at a time, so the regex engine
+    never retries every rule at every position. Optional suffixes are
+    greedy, which makes the first match at each position the longest rule.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if '' in node:
+            body = f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+def compile_rules(words):
+    """Compile replacement keys into one pattern with longest-match semantics"""
+    words = [word for word in words if word]
+    if not words:
+        return None
+    try:
+        return re.compile(_trie_pattern(words))
+    except (re.error, RecursionError):
+        # Fall back to a flat alternation, longest rules first
+        ordered = sorted(words, key=len, reverse=True)
+        return re.compile('|'.join(re.escape(word) for word in ordered))
+
+
+class ReplacementEngine:
+    """A user's text replacement rules compiled for single-pass rewriting.
+
+    The text is scanned once, left to right; at each position the longest
+    matching rule wins and replaced output is never rescanned. Small rule
+    sets find each rule with str.find instead, which gives the same result.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = dict(rules or {})
+        words = [word for word in self.rules if word]
+        self._pattern = compile_rules(words)
+        # Few rules are faster found one at a time than through the regex
+        self._words = words if len(words) <= SCAN_MAX_RULES else None
+
+    def apply(self, text):
+        """Rewrite text with every matching rule in one pass"""
+        if not text or self._pattern is None:
+            return text
+        if self._words is not None:
+            result = self._apply_scanned(text)
+            if result is not None:
+                return result
+        return self._pattern.sub(self._substitute, text)
+
+    def _apply_scanned(self, text):
+        """Find each rule with str.find and splice the replacements in.
+
+        Matches that are apart or nested give the same result as the regex: the
+        outermost of nested matches is the longest rule at the leftmost position.
+        Returns None when two matches partly overlap, which needs the regex.
+        """
+        spans = []
+        for word in self._words:
+            start = text.find(word)
+            while start != -1:
+                end = start + len(word)
+                spans.append((start, -end, word))
+                start = text.find(word, end)
+        if not spans:
+            return text
+        spans.sort()
+
+        parts = []
+        done = 0
+        for start, end, word in spans:
+            end = -end
+            if start >= done:
+                parts.append(text[done:start])
+                parts.append(self.rules[word])
+                done = end
+            elif end > done:
+                return None
+        parts.append(text[done:])
+        return ''.join(parts)
+
+    def _substitute(self, match):
+        return self.rules[match.group(0)]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __bool__(self):
+        return bool(self.rules)
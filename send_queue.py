@@ -0,0 +1,168 @@
+import logging
+import random
+import time
+import asyncio
+from telethon.errors import FloodWaitError, ServerError
+from metrics import FLOOD_WAITS, SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying; anything else (missing rights, deleted chat, ...) fails at once
+RETRYABLE_ERRORS = (ServerError, ConnectionError, asyncio.TimeoutError, OSError)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self):
+        """Take one token and return how long the caller must wait before using it"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(delay, self.paused_until - now)
+
+    def pause(self, seconds):
+        """Block the bucket for `seconds` (e.g. while Telegram demands a FLOOD_WAIT)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class SendQueue:
+    """Per-account send queue with per-destination ordering and rate limits.
+
+    Every destination gets its own FIFO drained by one worker task, so
+    messages reach a destination in the order they were submitted. Sends
+    are paced by a per-destination and a per-account token bucket. A
+    FloodWaitError pauses the whole account for the requested time (plus
+    jitter), since Telegram applies it to every send of the account, and the
+    same message is retried, so nothing is dropped.
+    """
+
+    def __init__(self, account_rate=5.0, account_burst=10, destination_rate=1.0, destination_burst=5,
+                 max_retries=5, idle_timeout=60.0, name=''):
+        self.name = name
+        self.destination_rate = destination_rate
+        self.destination_burst = destination_burst
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self._account_bucket = TokenBucket(account_rate, account_burst)
+        self._destinations = {}
+        self._stats = {
+            'sent': 0,
+            'failed': 0,
+            'retries': 0,
+            'flood_waits': 0,
+            'flood_wait_seconds': 0,
+            'last_wait_ms': 0.0,
+            'max_wait_ms': 0.0
+        }
+
+    async def submit(self, destination, send):
+        """Queue send() for a destination and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        lane = self._destinations.get(destination)
+        if lane is None:
+            lane = self._destinations[destination] = {
+                'queue': asyncio.Queue(),
+                'bucket': TokenBucket(self.destination_rate, self.destination_burst),
+                'worker': None
+            }
+        lane['queue'].put_nowait((send, future, time.monotonic()))
+        if lane['worker'] is None or lane['worker'].done():
+            lane['worker'] = asyncio.get_running_loop().create_task(self._drain(destination, lane))
+        return await future
+
+    async def _drain(self, destination, lane):
+        queue = lane['queue']
+        while True:
+            try:
+                send, future, queued_at = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    self._destinations.pop(destination, None)
+                    return
+                continue
+
+            if future.cancelled():
+                continue
+            try:
+                result = await self._send_with_retry(destination, lane, send)
+                self._record_wait(queued_at)
+                self._stats['sent'] += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self._stats['failed'] += 1
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _send_with_retry(self, destination, lane, send):
+        bucket = lane['bucket']
+        attempt = 0
+        while True:
+            await asyncio.sleep(max(bucket.reserve(), self._account_bucket.reserve()))
+            # Another lane may have hit a FLOOD_WAIT while this one slept
+            while True:
+                paused = max(bucket.paused_until, self._account_bucket.paused_until) - time.monotonic()
+                if paused <= 0:
+                    break
+                await asyncio.sleep(paused)
+            started = time.perf_counter()
+            try:
+                result = await send()
+                SEND_SECONDS.observe(time.perf_counter() - started)
+                return result
+            except FloodWaitError as e:
+                wait = e.seconds + random.uniform(0.5, 1.5)
+                self._stats['flood_waits'] += 1
+                FLOOD_WAITS.inc(user=self.name)
+                self._stats['flood_wait_seconds'] += e.seconds
+                logger.warning(f"⏳ FLOOD_WAIT of {e.seconds}s for {destination}, pausing all sends of the account "
+                               f"({self.depth()} messages waiting)")
+                bucket.pause(wait)
+                self._account_bucket.pause(wait)
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                self._stats['retries'] += 1
+                delay = min(2 ** attempt, 60) * random.uniform(0.5, 1.5)
+                logger.warning(f"⚠️ Send to {destination} failed ({str(e)}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                bucket.pause(delay)
+
+    def _record_wait(self, queued_at):
+        wait_ms = (time.monotonic() - queued_at) * 1000
+        self._stats['last_wait_ms'] = wait_ms
+        self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+
+    def depth(self, destination=None):
+        """Number of messages waiting, for one destination or in total"""
+        if destination is not None:
+            lane = self._destinations.get(destination)
+            return lane['queue'].qsize() if lane else 0
+        return sum(lane['queue'].qsize() for lane in self._destinations.values())
+
+    def stats(self):
+        """Return queue depth, wait time and flood-wait counters"""
+        stats = dict(self._stats)
+        stats['queue_depth'] = self.depth()
+        stats['destinations'] = {destination: lane['queue'].qsize() for destination, lane in self._destinations.items()}
+        return stats
+
+    async def close(self):
+        """Stop the destination workers, cancelling anything still queued"""
+        for lane in list(self._destinations.values()):
+            if lane['worker']:
+                lane['worker'].cancel()
+            while not lane['queue'].empty():
+                _, future, _ = lane['queue'].get_nowait()
+                future.cancel()
+        self._destinations.clear()
@@ -0,0 +1,119 @@
+import bisect
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring mapping telegram IDs onto worker IDs.
+
+    Each worker gets `replicas` virtual nodes, so adding or removing one
+    worker only moves roughly 1/N of the users.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self._keys = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            key = _hash(f"{node}#{i}")
+            if key not in self._nodes:
+                bisect.insort(self._keys, key)
+            self._nodes[key] = node
+
+    def remove(self, node):
+        for i in range(self.replicas):
+            key = _hash(f"{node}#{i}")
+            if self._nodes.get(key) == node:
+                del self._nodes[key]
+                self._keys.remove(key)
+
+    def get(self, key):
+        """Return the node responsible for key, or None if the ring is empty"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[self._keys[index]]
+
+    def __len__(self):
+        return len(set(self._nodes.values()))
+
+
+class WorkerCoordinator:
+    """Registers a forwarding worker in Postgres and arbitrates session ownership.
+
+    Workers heartbeat into forwarding_workers. session_owners holds at most
+    one row per telegram account; a worker may only claim a row that is
+    free, already its own, or held by a worker whose heartbeat has expired.
+    """
+
+    def __init__(self, worker_id, db_pool, lease_timeout=30):
+        self.worker_id = worker_id
+        self.db_pool = db_pool
+        self.lease_timeout = lease_timeout
+
+    async def heartbeat(self):
+        """Record that this worker is alive"""
+        await self.db_pool.execute("""
+            INSERT INTO forwarding_workers (worker_id, heartbeat_at)
+            VALUES (%s, CURRENT_TIMESTAMP)
+            ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = EXCLUDED.heartbeat_at
+        """, (self.worker_id,))
+
+    async def live_workers(self):
+        """List workers with a fresh heartbeat"""
+        rows = await self.db_pool.fetchall("""
+            SELECT worker_id
+            FROM forwarding_workers
+            WHERE heartbeat_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+            ORDER BY worker_id
+        """, (self.lease_timeout,))
+        return [row['worker_id'] for row in rows]
+
+    async def owned_sessions(self):
+        """Telegram IDs currently owned by this worker"""
+        rows = await self.db_pool.fetchall("""
+            SELECT telegram_id FROM session_owners WHERE worker_id = %s
+        """, (self.worker_id,))
+        return {row['telegram_id'] for row in rows}
+
+    async def claim(self, telegram_id):
+        """Take ownership of a session; returns False if another live worker holds it"""
+        row = await self.db_pool.fetchone("""
+            INSERT INTO session_owners (telegram_id, worker_id, claimed_at)
+            VALUES (%s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (telegram_id) DO UPDATE
+            SET worker_id = EXCLUDED.worker_id,
+                claimed_at = EXCLUDED.claimed_at
+            WHERE session_owners.worker_id = EXCLUDED.worker_id
+               OR NOT EXISTS (
+                   SELECT 1 FROM forwarding_workers w
+                   WHERE w.worker_id = session_owners.worker_id
+                     AND w.heartbeat_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+               )
+            RETURNING telegram_id
+        """, (telegram_id, self.worker_id, self.lease_timeout))
+        return row is not None
+
+    async def release(self, telegram_id):
+        """Give up ownership of a session"""
+        await self.db_pool.execute("""
+            DELETE FROM session_owners WHERE telegram_id = %s AND worker_id = %s
+        """, (telegram_id, self.worker_id))
+
+    async def deregister(self):
+        """Release every session and remove this worker from the registry"""
+        await self.db_pool.execute("""
+            DELETE FROM session_owners WHERE worker_id = %s;
+            DELETE FROM forwarding_workers WHERE worker_id = %s;
+        """, (self.worker_id, self.worker_id))
+        logger.info(f"👋 Worker {self.worker_id} deregistered")
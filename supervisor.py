@@ -0,0 +1,122 @@
+import logging
+import threading
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+
+class ForwardingSupervisor:
+    """One long-lived asyncio loop that hosts every user's forwarding session.
+
+    Sessions run as tasks keyed by user, so hundreds of users cost hundreds
+    of coroutines rather than hundreds of threads and event loops. Other
+    threads (e.g. Flask request handlers) talk to the loop through submit()
+    and call(), which are thread-safe.
+    """
+
+    def __init__(self, name='forwarding-supervisor'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    @property
+    def loop(self):
+        self.start()
+        return self._loop
+
+    def in_loop(self):
+        """Whether the caller is running on the supervisor loop"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def start(self):
+        """Start the supervisor loop in a background thread if it is not running"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, name=self.name, daemon=True)
+            self._thread.start()
+        self._ready.wait()
+        logger.info("✅ Forwarding supervisor started")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._ready.set)
+        self._loop.run_forever()
+
+    def run_forever(self):
+        """Run the supervisor loop on the calling thread until stop() is called"""
+        with self._lock:
+            if self._loop is not None:
+                raise RuntimeError("Supervisor is already running")
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.current_thread()
+        self._run_loop()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the supervisor loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, coro, timeout=30):
+        """Run a coroutine on the supervisor loop and wait for its result"""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("call() would deadlock on the supervisor loop; await the coroutine instead")
+        return self.submit(coro).result(timeout=timeout)
+
+    def spawn(self, key, coro):
+        """Start a keyed task on the supervisor loop (must be called on the loop)"""
+        task = self._loop.create_task(coro, name=f"{self.name}:{key}")
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception():
+            logger.error(f"❌ Supervised task {key} failed: {task.exception()}")
+
+    def get_task(self, key):
+        return self._tasks.get(key)
+
+    async def cancel(self, key):
+        """Cancel a keyed task and wait for it to finish cleaning up"""
+        task = self._tasks.get(key)
+        if not task:
+            return False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ Error while stopping task {key}: {str(e)}")
+        return True
+
+    def keys(self):
+        return list(self._tasks)
+
+    async def _shutdown(self):
+        for key in self.keys():
+            await self.cancel(key)
+        self._loop.stop()
+
+    def stop(self, timeout=30):
+        """Cancel every task and stop the supervisor loop"""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        if self._thread is not threading.current_thread():
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+            self._thread.join(timeout)
+        logger.info("👋 Forwarding supervisor stopped")
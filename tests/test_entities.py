@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+from telethon import utils
+from telethon.errors import ChannelInvalidError
+from telethon.tl.types import Channel, InputPeerChannel
+from entities import EntityCache
+
+CHANNEL_ID = 1234
+CHAT_ID = utils.get_peer_id(InputPeerChannel(CHANNEL_ID, 0))
+
+
+class FakeClient:
+    """A session that still holds an access hash Telegram no longer accepts"""
+
+    def __init__(self):
+        self.stale = InputPeerChannel(CHANNEL_ID, 111)
+        self.current = Channel(id=CHANNEL_ID, title='Destination', photo=None, date=None, access_hash=222)
+
+    async def get_input_entity(self, chat_id):
+        return self.stale
+
+    async def get_entity(self, chat_id):
+        # Like Telethon, resolves through the stored hash and fails with it
+        raise ChannelInvalidError(request=None)
+
+    async def iter_dialogs(self):
+        yield SimpleNamespace(id=utils.get_peer_id(self.current), entity=self.current)
+
+
+def test_stale_access_hash_is_renewed():
+    client = FakeClient()
+    entities = EntityCache(client)
+    sent = []
+
+    async def request(peer):
+        sent.append(peer)
+        if peer.access_hash != client.current.access_hash:
+            raise ChannelInvalidError(request=None)
+        return 'sent'
+
+    async def run():
+        assert await entities.call(CHAT_ID, request) == 'sent'
+        # The renewed peer is cached for the next send
+        assert await entities.call(CHAT_ID, request) == 'sent'
+
+    asyncio.run(run())
+    assert [peer.access_hash for peer in sent] == [111, 222, 222]
@@ -0,0 +1,14 @@
+import os
+import pytest
+import migrate
+
+# Never DATABASE_URL: migrating applies every manual migration, locks included
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def test_hot_queries_are_index_backed():
+    """Every hot query is served by an index once the schema is migrated"""
+    migrate.migrate(TEST_DATABASE_URL, manual=True)
+    assert migrate.check_plans(TEST_DATABASE_URL) == {}